@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from telebot.async_telebot import AsyncTeleBot
+from config import TELEGRAM_TOKEN, ASYNC_HANDLER_WORKERS, LOCAL_INDEX_ENABLED
+import bot as app
+from search import SOURCES, SEARCH_DONE, run_sources_async
+from vacancy_index import mark_refreshed
+from settings_repository import settings_repository
+from parsers import hh_parser
+
+logger = logging.getLogger(__name__)
+
+# Receives updates on the event loop; every other handler is reused from bot.py
+async_bot = AsyncTeleBot(TELEGRAM_TOKEN)
+
+# Short blocking work (cached lookups, small DB writes) runs on a fixed pool, not a thread per update
+handler_executor = ThreadPoolExecutor(max_workers=ASYNC_HANDLER_WORKERS, thread_name_prefix="handler")
+
+# One lock per active user keeps their settings conversation in order
+user_locks = weakref.WeakValueDictionary()
+
+
+def user_lock(user_id: int) -> asyncio.Lock:
+    lock = user_locks.get(user_id)
+    if lock is None:
+        lock = user_locks[user_id] = asyncio.Lock()
+    return lock
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(handler_executor, fn, *args)
+
+
+@async_bot.message_handler(commands=['search'])
+async def search_jobs(message):
+    user_id = message.from_user.id
+
+    await async_bot.send_chat_action(user_id, 'typing')
+
+    try:
+        settings = await run_blocking(settings_repository.get_or_default, user_id)
+        if LOCAL_INDEX_ENABLED:
+            progress, stale = await run_blocking(app.start_search, user_id, settings)
+        else:
+            progress, stale = await run_blocking(app.SearchProgress, user_id), list(SOURCES)
+
+        # Waiting on upstream holds no thread, so the refresh stays in the handler
+        async for name, outcome, vacancies in run_sources_async(settings, {name: SOURCES[name] for name in stale}):
+            await run_blocking(progress.update, name, outcome, vacancies)
+            if outcome == SEARCH_DONE:
+                await run_blocking(mark_refreshed, name, settings)
+
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        app.queue_send(user_id, "⚠️ Error occurred while searching")
+
+@async_bot.message_handler(func=lambda message: True, content_types=['text'])
+async def forward_message(message):
+    async with user_lock(message.from_user.id):
+        await run_blocking(app.bot.process_new_messages, [message])
+
+@async_bot.callback_query_handler(func=lambda call: True)
+async def forward_callback_query(call):
+    await run_blocking(app.bot.process_new_callback_query, [call])
+
+
+async def main():
+    from models import Base
+    from config import engine, LINKEDIN_HTTP_ENABLED, METRICS_ENABLED
+    from metrics import start_metrics_server
+    from parsers.driver_pool import driver_pool
+
+    # Create database tables
+    Base.metadata.create_all(bind=engine)
+
+    # Forwarded updates must run inline on our executor, not on telebot's own thread pool
+    app.bot.threaded = False
+
+    if not LINKEDIN_HTTP_ENABLED:
+        threading.Thread(target=driver_pool.warm, name="driver-warmup", daemon=True).start()
+    app.scheduler.start()
+    if METRICS_ENABLED:
+        start_metrics_server()
+
+    logger.info("Starting async bot...")
+    print("Starting async bot...")
+    try:
+        await async_bot.infinity_polling(timeout=30, skip_pending=True)
+    finally:
+        if hh_parser.async_session is not None:
+            await hh_parser.async_session.close()
+        await async_bot.close_session()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
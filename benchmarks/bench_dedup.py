@@ -0,0 +1,70 @@
+# Throughput of cross-source dedup on synthetic HH + LinkedIn batches.
+# Usage: python benchmarks/bench_dedup.py [sizes...]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import deduplicate
+
+ROLES = ["Python", "Backend", "Data", "ML", "Django", "Go", "Java", "Frontend", "DevOps", "QA"]
+LEVELS = ["Junior", "Middle", "Senior", "Lead", ""]
+TITLES = ["Developer", "Engineer", "Programmer", "Analyst"]
+SUFFIXES = ["LLC", "Inc", "ООО", "GmbH", ""]
+
+
+def make_postings(count: int, duplicate_share: float = 0.3, seed: int = 1):
+    rng = random.Random(seed)
+    companies = [f"Company {i}" for i in range(max(count // 20, 1))]
+    postings = []
+    while len(postings) < count:
+        title = " ".join(filter(None, [rng.choice(LEVELS), rng.choice(ROLES), rng.choice(TITLES)]))
+        company = rng.choice(companies)
+        postings.append({
+            "external_id": str(len(postings)),
+            "title": title,
+            "company": f"{company} {rng.choice(SUFFIXES)}".strip(),
+            "salary": f"{rng.randrange(50, 400)}000-None RUR",
+            "url": f"https://hh.ru/vacancy/{len(postings)}",
+            "source": "HeadHunter"
+        })
+        if rng.random() < duplicate_share and len(postings) < count:
+            postings.append({
+                "title": f"{title} (Remote)".upper(),
+                "company": company,
+                "salary": "Not specified",
+                "url": f"https://www.linkedin.com/jobs/view/{len(postings)}",
+                "source": "LinkedIn"
+            })
+    rng.shuffle(postings)
+    return postings
+
+
+# Same title at the same company on one board: two jobs. The same job on two boards: one
+def check_sources():
+    hh = [
+        {"external_id": "1", "title": "Python Developer", "company": "Yandex", "url": "https://hh.ru/vacancy/1", "source": "HeadHunter"},
+        {"external_id": "2", "title": "Python Developer", "company": "Yandex", "url": "https://hh.ru/vacancy/2", "source": "HeadHunter"}
+    ]
+    linkedin = {"title": "Python Developer", "company": "Yandex LLC", "url": "https://www.linkedin.com/jobs/view/3", "source": "LinkedIn"}
+    same_source = deduplicate(hh)
+    cross_source = deduplicate(hh[:1] + [linkedin])
+    print(f"same board, same title: {len(same_source)} of 2 kept; HH + LinkedIn copy: {len(cross_source)} of 2 kept")
+    assert len(same_source) == 2 and len(cross_source) == 1
+
+
+def run(sizes):
+    print(f"{'postings':>10} {'kept':>8} {'seconds':>9} {'postings/s':>12}")
+    for size in sizes:
+        postings = make_postings(size)
+        started = time.perf_counter()
+        kept = deduplicate(postings)
+        elapsed = time.perf_counter() - started
+        print(f"{size:>10} {len(kept):>8} {elapsed:>9.3f} {size / elapsed:>12.0f}")
+
+
+if __name__ == "__main__":
+    check_sources()
+    run([int(arg) for arg in sys.argv[1:]] or [1000, 5000, 10000, 20000, 50000])
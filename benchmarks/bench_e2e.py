@@ -0,0 +1,422 @@
+# End-to-end /search benchmark, fully offline.
+# A local server stands in for the HH API (recorded /vacancies pages), LinkedIn's guest job search
+# (saved result cards) and the Telegram Bot API, and the real handler runs against it.
+# Usage: python benchmarks/bench_e2e.py [--searches 200] [--concurrency 4] [--warm]
+#                                       [--json out.json] [--compare baseline.json]
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(BENCH_DIR, "fixtures")
+LINKEDIN_PAGE_SIZE = 10
+STAGES = ("settings", "local_index", "source:HeadHunter", "source:LinkedIn", "delivery_check", "formatting", "api_call", "send_wait")
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+def summarize(values) -> dict:
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+# --- Fake upstreams -------------------------------------------------------
+
+def load_hh_pages():
+    with open(os.path.join(FIXTURES, "hh_vacancies.json"), encoding="utf-8") as f:
+        recorded = json.load(f)
+    pages = []
+    for page in range(recorded["pages"]):
+        # Same recorded items on every page, with ids made unique per page
+        items = [dict(item, id=f"{item['id']}{page}", alternate_url=f"{item['alternate_url']}{page}")
+                 for item in recorded["items"]]
+        pages.append(json.dumps(dict(recorded, items=items, page=page), ensure_ascii=False).encode("utf-8"))
+    return pages
+
+def load_linkedin_items():
+    from lxml import html
+    with open(os.path.join(FIXTURES, "linkedin_search.html"), encoding="utf-8") as f:
+        document = html.fromstring(f.read())
+    return [html.tostring(item, encoding="unicode")
+            for item in document.xpath("//ul[contains(@class, 'jobs-search__results-list')]/li")]
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.hh_pages = load_hh_pages()
+        self.linkedin_items = load_linkedin_items()
+        with open(os.path.join(ROOT, "parsers", "hh_areas_snapshot.json"), "rb") as f:
+            self.areas = f.read()
+        self.calls = defaultdict(int)
+        self._message_ids = defaultdict(int)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="fake-upstream", daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def hh(self, query) -> bytes:
+        page = int(query.get("page", ["0"])[0])
+        return self.hh_pages[page] if page < len(self.hh_pages) else self.hh_pages[0]
+
+    def linkedin(self, query) -> bytes:
+        start = int(query.get("start", ["0"])[0])
+        return "".join(self.linkedin_items[start:start + LINKEDIN_PAGE_SIZE]).encode("utf-8")
+
+    # Just enough of the Bot API for what /search calls
+    def telegram(self, method: str, params) -> bytes:
+        chat_id = int(params.get("chat_id", ["0"])[0])
+        if method == "sendChatAction":
+            result = True
+        else:
+            with self._lock:
+                if method == "sendMessage":
+                    self._message_ids[chat_id] += 1
+                message_id = int(params.get("message_id", [self._message_ids[chat_id]])[0])
+            result = {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", [""])[0]
+            }
+        return json.dumps({"ok": True, "result": result}).encode("utf-8")
+
+    def handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def respond(self, body: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def route(self):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    query.update(parse_qs(self.rfile.read(length).decode("utf-8")))
+
+                parts = url.path.strip("/").split("/")
+                if parts[:2] == ["hh", "areas"]:
+                    kind = "hh_areas"
+                elif parts[0] == "telegram":
+                    kind = parts[-1]
+                else:
+                    kind = parts[0]
+                with upstream._lock:
+                    upstream.calls[kind] += 1
+
+                if kind == "hh_areas":
+                    self.respond(upstream.areas, "application/json")
+                elif kind == "hh":
+                    self.respond(upstream.hh(query), "application/json")
+                elif parts[0] == "linkedin":
+                    self.respond(upstream.linkedin(query), "text/html; charset=utf-8")
+                else:
+                    self.respond(upstream.telegram(parts[-1], query), "application/json")
+
+            do_GET = route
+            do_POST = route
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# --- Instrumented bot -----------------------------------------------------
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.futures = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage: str, fn):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - started)
+        return wrapper
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.futures.clear()
+
+
+# Points the bot at the fake upstream; everything that writes to disk goes to workdir, caches stay in memory
+def configure(upstream: FakeUpstream, workdir: str):
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(workdir, "bench.db")
+    import config
+    config.TELEGRAM_TOKEN = "123456:bench"
+    config.RESULT_CACHE_PATH = None
+    config.HH_HTTP_CACHE_PATH = ":memory:"
+    config.HH_API_URL = upstream.url + "/hh/vacancies"
+    config.HH_AREAS_URL = upstream.url + "/hh/areas"
+    config.HH_AREAS_CACHE_PATH = os.path.join(workdir, "hh_areas.json")
+    # Exchange rates stay at the built-in table instead of being downloaded
+    config.HH_CURRENCY_TTL = float("inf")
+    config.LINKEDIN_GUEST_API_URL = upstream.url + "/linkedin/search"
+    config.METRICS_ENABLED = False
+
+    from telebot import apihelper
+    apihelper.API_URL = upstream.url + "/telegram/bot{0}/{1}"
+
+    import bot
+    from models import Base
+    from parsers import hh_parser, linkedin_http
+
+    hh_parser.HH_API_URL = config.HH_API_URL
+    linkedin_http.LINKEDIN_GUEST_API_URL = config.LINKEDIN_GUEST_API_URL
+    Base.metadata.create_all(bind=config.engine)
+    return bot
+
+
+def setup(upstream: FakeUpstream, workdir: str, recorder: Recorder):
+    bot = configure(upstream, workdir)
+    from search import SOURCES
+
+    # Run handlers inline so the calling thread sees the whole search
+    bot.bot.threaded = False
+
+    bot.settings_repository.get_or_default = recorder.timed("settings", bot.settings_repository.get_or_default)
+    for name, source in SOURCES.items():
+        source.search = recorder.timed(f"source:{name}", source.search)
+    bot.filter_new_vacancies = recorder.timed("delivery_check", bot.filter_new_vacancies)
+    bot.send_digest = recorder.timed("formatting", bot.send_digest)
+    bot.bot.send_message = recorder.timed("api_call", bot.bot.send_message)
+    bot.bot.edit_message_text = recorder.timed("api_call", bot.bot.edit_message_text)
+    bot.search_local = recorder.timed("local_index", bot.search_local)
+
+    # Upstream refreshes finish after the handler returns; a search is delivered once they are done too
+    refresh = bot.refresh_executor.submit
+
+    def recorded_refresh(fn, progress, *args):
+        future = refresh(fn, progress, *args)
+        with recorder._lock:
+            recorder.futures[progress.user_id].append(future)
+        return future
+
+    bot.refresh_executor.submit = recorded_refresh
+
+    submit = bot.send_queue.submit
+
+    def recorded_submit(chat_id, fn, *args, **kwargs):
+        queued = time.perf_counter()
+        future = submit(chat_id, fn, *args, **kwargs)
+        future.add_done_callback(lambda _: recorder.add("send_wait", time.perf_counter() - queued))
+        with recorder._lock:
+            recorder.futures[chat_id].append(future)
+        return future
+
+    bot.send_queue.submit = recorded_submit
+    return bot
+
+
+def search_message(user_id: int):
+    from telebot import types
+    return types.Message.de_json({
+        "message_id": 1,
+        "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+        "chat": {"id": user_id, "type": "private"},
+        "date": int(time.time()),
+        "text": "/search"
+    })
+
+
+def prepare_users(bot, count: int, warm: bool, offset: int = 0):
+    # Cold runs give every user a distinct query so the result cache never answers
+    for user_id in range(offset, offset + count):
+        keywords = ["Python"] if warm else [f"Python{user_id}"]
+        bot.settings_repository.update(user_id + 1, keywords=keywords, locations=["Moscow"], salary_min=0)
+
+
+# Returns (handler seconds, delivered seconds): the handler returning vs. every queued message sent
+def run_search(bot, recorder: Recorder, user_id: int):
+    started = time.perf_counter()
+    bot.bot.process_new_messages([search_message(user_id)])
+    handled = time.perf_counter() - started
+    while True:
+        with recorder._lock:
+            futures = list(recorder.futures.pop(user_id, []))
+        if not futures:
+            break
+        for future in futures:
+            future.result(timeout=60)
+    return handled, time.perf_counter() - started
+
+
+def run_load(bot, recorder: Recorder, searches: int, concurrency: int, offset: int):
+    handler, delivered = [], []
+    lock = threading.Lock()
+    next_user = iter(range(offset + 1, offset + searches + 1))
+
+    def worker():
+        while True:
+            with lock:
+                user_id = next(next_user, None)
+            if user_id is None:
+                return
+            handled, done = run_search(bot, recorder, user_id)
+            with lock:
+                handler.append(handled)
+                delivered.append(done)
+
+    threads = [threading.Thread(target=worker, name=f"bench-{i}") for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return handler, delivered, time.perf_counter() - started
+
+
+def measure_memory(bot, recorder: Recorder, searches: int, offset: int) -> dict:
+    peaks, retained = [], []
+    tracemalloc.start()
+    for user_id in range(offset + 1, offset + searches + 1):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run_search(bot, recorder, user_id)
+        after, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before)
+        retained.append(after - before)
+    tracemalloc.stop()
+    return {
+        "searches": searches,
+        "peak_kb_mean": round(sum(peaks) / len(peaks) / 1024, 1),
+        "peak_kb_max": round(max(peaks) / 1024, 1),
+        "retained_kb_mean": round(sum(retained) / len(retained) / 1024, 1),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def print_report(report: dict, baseline: dict = None):
+    rows = [("end_to_end:handler", report["end_to_end"]["handler"]),
+            ("end_to_end:delivered", report["end_to_end"]["delivered"])]
+    rows += [(stage, stats) for stage, stats in report["stages"].items()]
+    print(f"{report['searches']} searches, concurrency {report['concurrency']}, "
+          f"{'warm' if report['warm'] else 'cold'} cache, {report['throughput_per_s']} searches/s")
+    print(f"{'stage':<24} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in rows:
+        line = f"{name:<24} {stats['count']:>6} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+        base = None
+        if baseline:
+            base = baseline["end_to_end"].get(name.split(":", 1)[1]) if name.startswith("end_to_end") \
+                else baseline["stages"].get(name)
+        if base and base["p50_ms"]:
+            line += f"   p50 {(stats['p50_ms'] / base['p50_ms'] - 1) * 100:+.0f}% vs {baseline['commit']}"
+        print(line)
+    memory = report["memory"]
+    print(f"memory per search: peak {memory['peak_kb_mean']} KB (max {memory['peak_kb_max']} KB), "
+          f"retained {memory['retained_kb_mean']} KB, process max RSS {memory['max_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--searches", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--memory-searches", type=int, default=20)
+    parser.add_argument("--warm", action="store_true", help="all users share one query, so the result cache answers")
+    parser.add_argument("--json", help="where to save results (default: benchmarks/results/e2e-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to compare p50s against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    upstream = FakeUpstream()
+    upstream.start()
+    recorder = Recorder()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bot = setup(upstream, workdir, recorder)
+        total = args.searches + args.memory_searches + 1
+        prepare_users(bot, total, args.warm)
+
+        # One search first so imports, connections and the engine are warm
+        run_search(bot, recorder, total)
+        recorder.reset()
+
+        handler, delivered, elapsed = run_load(bot, recorder, args.searches, args.concurrency, 0)
+        stages = {stage: summarize(recorder.samples[stage]) for stage in STAGES if recorder.samples.get(stage)}
+        memory = measure_memory(bot, recorder, args.memory_searches, args.searches)
+        upstream.stop()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "searches": args.searches,
+        "concurrency": args.concurrency,
+        "warm": args.warm,
+        "throughput_per_s": round(args.searches / elapsed, 2),
+        "end_to_end": {"handler": summarize(handler), "delivered": summarize(delivered)},
+        "stages": stages,
+        "memory": memory,
+        "upstream_calls": dict(upstream.calls)
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    path = args.json or os.path.join(BENCH_DIR, "results", f"e2e-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
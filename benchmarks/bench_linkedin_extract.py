@@ -0,0 +1,75 @@
+# Per-element vs single-script extraction of LinkedIn result cards, on a saved results page.
+# Needs Chrome. Usage: python benchmarks/bench_linkedin_extract.py [rounds]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium.webdriver.common.by import By
+from parsers.driver_pool import create_driver
+from parsers.linkedin_parser import EXTRACT_CARDS_SCRIPT, card_to_vacancy
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "linkedin_search.html")
+LIMIT = 15
+
+
+# The extraction loop login_and_search used before: three lookups and an attribute read per card
+def extract_per_element(driver):
+    vacancies = []
+    for job in driver.find_elements(By.CSS_SELECTOR, ".jobs-search__results-list li")[:LIMIT]:
+        vacancies.append({
+            "title": job.find_element(By.CSS_SELECTOR, "h3").text.strip(),
+            "company": job.find_element(By.CSS_SELECTOR, "h4").text.strip(),
+            "url": job.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
+        })
+    return vacancies
+
+def extract_bulk(driver):
+    return [card_to_vacancy(card) for card in driver.execute_script(EXTRACT_CARDS_SCRIPT, 0)[:LIMIT]]
+
+
+def count_commands(driver):
+    counter = {"commands": 0}
+    execute = driver.execute
+
+    def counting_execute(*args, **kwargs):
+        counter["commands"] += 1
+        return execute(*args, **kwargs)
+
+    driver.execute = counting_execute
+    return counter
+
+
+def measure(driver, counter, extract, rounds):
+    counter["commands"] = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = extract(driver)
+    elapsed = (time.perf_counter() - started) / rounds
+    return result, elapsed, counter["commands"] // rounds
+
+
+def run(rounds: int):
+    driver = create_driver()
+    try:
+        driver.get("file://" + FIXTURE)
+        counter = count_commands(driver)
+
+        old, old_time, old_commands = measure(driver, counter, extract_per_element, rounds)
+        new, new_time, new_commands = measure(driver, counter, extract_bulk, rounds)
+
+        for before, after in zip(old, new):
+            assert before["title"] == after["title"] and before["company"] == after["company"]
+            assert before["url"].split("?")[0] == after["url"]
+
+        print(f"{'path':>12} {'ms/search':>10} {'webdriver calls':>16}")
+        print(f"{'per-element':>12} {old_time * 1000:>10.1f} {old_commands:>16}")
+        print(f"{'bulk script':>12} {new_time * 1000:>10.1f} {new_commands:>16}")
+        print(f"bulk path also reads location/date/job id, e.g. {new[0]['location']!r}, {new[0]['posted_at']!r}")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
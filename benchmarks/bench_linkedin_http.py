@@ -0,0 +1,77 @@
+# Browserless LinkedIn search against a local server replaying saved guest-API pages.
+# Runs offline. Usage: python benchmarks/bench_linkedin_http.py [searches]
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lxml import html
+from parsers import linkedin_http
+from parsers.linkedin_parser import card_to_vacancy
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PAGE_SIZE = 10
+
+Query = namedtuple("Query", "keywords locations")
+
+def load_items():
+    with open(os.path.join(FIXTURES, "linkedin_search.html"), encoding="utf-8") as f:
+        document = html.fromstring(f.read())
+    return [html.tostring(item, encoding="unicode") for item in document.xpath("//ul[contains(@class, 'jobs-search__results-list')]/li")]
+
+
+# Answers like seeMoreJobPostings: PAGE_SIZE bare <li> cards from ?start=, empty body past the end
+def make_handler(items):
+    class GuestApiHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = int(parse_qs(urlparse(self.path).query).get("start", ["0"])[0])
+            body = "".join(items[start:start + PAGE_SIZE]).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return GuestApiHandler
+
+
+def run(searches: int):
+    items = load_items()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(items))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    linkedin_http.LINKEDIN_GUEST_API_URL = f"http://127.0.0.1:{server.server_port}/search"
+
+    with open(os.path.join(FIXTURES, "linkedin_guest_page.html"), encoding="utf-8") as f:
+        page = f.read()
+    started = time.perf_counter()
+    for _ in range(searches):
+        cards = linkedin_http.parse_cards(page)
+    parse_time = (time.perf_counter() - started) / searches
+    assert len(cards) == PAGE_SIZE and all(card["job_id"] and card["title"] for card in cards)
+
+    query = Query(["Python"], ["Remote"])
+    latencies = []
+    for _ in range(searches):
+        started = time.perf_counter()
+        vacancies = [card_to_vacancy(card) for card in linkedin_http.search_cards(query, limit=len(items))]
+        latencies.append(time.perf_counter() - started)
+    server.shutdown()
+
+    assert len(vacancies) == len(items)
+    assert len({vacancy["external_id"] for vacancy in vacancies}) == len(items)
+    latencies.sort()
+    print(f"parse one page ({PAGE_SIZE} cards): {parse_time * 1000:.2f} ms")
+    print(f"full search ({len(items)} cards, {-(-len(items) // PAGE_SIZE) + 1} requests): "
+          f"p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
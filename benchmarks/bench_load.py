@@ -0,0 +1,369 @@
+# Load test: thousands of synthetic users replayed through bot.process_new_updates, as the polling loop
+# delivers them. Each user runs /settings -> Change Keywords -> <keywords> -> /search and sends the next
+# update only once the previous one was handled. Sources are stubbed in-process; the Bot API is the fake
+# server from bench_e2e.py.
+# Usage: python benchmarks/bench_load.py [--users 2000] [--threads 2] [--ramp 10] [--source-latency 0.2]
+#                                        [--queries 100] [--json out.json]
+import argparse
+import json
+import os
+import queue
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_e2e import FIXTURES, FakeUpstream, configure, git_commit, summarize
+
+BATCH_SIZE = 100
+
+
+def session_script(user_id: int, queries: int):
+    return ["/settings", "Change Keywords", f"Python, Query{user_id % queries}", "/search"]
+
+
+def load_vacancies():
+    from parsers import hh_parser, linkedin_http
+    from parsers.linkedin_parser import card_to_vacancy
+    with open(os.path.join(FIXTURES, "hh_vacancies.json"), encoding="utf-8") as f:
+        hh = [hh_parser.format_vacancy(item) for item in json.load(f)["items"]]
+    with open(os.path.join(FIXTURES, "linkedin_search.html"), encoding="utf-8") as f:
+        linkedin = [card_to_vacancy(card) for card in linkedin_http.parse_cards(f.read())]
+    return hh, linkedin
+
+
+# Replaces the network part of each source, below the result cache and single-flight
+def stub_sources(latency: float):
+    from parsers import hh_parser, linkedin_parser
+    hh, linkedin = load_vacancies()
+
+    def search_hh(query):
+        time.sleep(latency)
+        return [dict(vacancy) for vacancy in hh]
+
+    def search_linkedin(query):
+        time.sleep(latency)
+        return [dict(vacancy) for vacancy in linkedin]
+
+    hh_parser.search_hh = search_hh
+    linkedin_parser.search_linkedin = search_linkedin
+
+
+class LoadRun:
+    def __init__(self, bot, users: int, queries: int):
+        self.bot = bot
+        self.scripts = {user_id: session_script(user_id, queries) for user_id in range(1, users + 1)}
+        self.steps = defaultdict(int)
+        self.fed_at = {}
+        self.update_id = 0
+        self.updates = queue.Queue()
+        self.done = threading.Event()
+        self.finished_sessions = 0
+        self.queue_delay = []
+        self.handler_time = defaultdict(list)
+        self.handled = 0
+        self.refreshes = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def make_update(self, user_id: int):
+        from telebot.types import Update
+        with self._lock:
+            self.update_id += 1
+            update_id = self.update_id
+            text = self.scripts[user_id][self.steps[user_id]]
+            self.fed_at[(user_id, update_id)] = time.perf_counter()
+        return Update.de_json({
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "from": {"id": user_id, "is_bot": False, "first_name": f"Load{user_id}"},
+                "chat": {"id": user_id, "type": "private"},
+                "date": int(time.time()),
+                "text": text,
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else []
+            }
+        })
+
+    def instrument(self):
+        for handler in self.bot.bot.message_handlers:
+            handler["function"] = self.tracked(handler["function"])
+
+        # /search returns once saved jobs are out; the upstream refresh it starts is recorded per user
+        refresh = self.bot.refresh_executor.submit
+
+        def recorded_refresh(fn, progress, *args):
+            future = refresh(fn, progress, *args)
+            with self._lock:
+                self.refreshes[progress.user_id].append(future)
+            return future
+
+        self.bot.refresh_executor.submit = recorded_refresh
+
+    def tracked(self, fn):
+        def wrapper(message, *args, **kwargs):
+            key = (message.from_user.id, message.message_id)
+            started = time.perf_counter()
+            with self._lock:
+                fed = self.fed_at.pop(key, None)
+            if fed is not None:
+                self.queue_delay.append(started - fed)
+            try:
+                return fn(message, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                user_id = message.from_user.id
+                with self._lock:
+                    self.handler_time[fn.__name__].append(elapsed)
+                    self.handled += 1
+                    refreshes = self.refreshes.pop(user_id, [])
+                if fed is not None:
+                    if refreshes:
+                        self.advance_after(user_id, fn.__name__, started, refreshes)
+                    else:
+                        self.advance(user_id)
+        return wrapper
+
+    # The reply is complete only when the upstream refresh is: time it as "<handler> + refresh"
+    # and move the user on then, without holding a telebot worker thread
+    def advance_after(self, user_id: int, name: str, started: float, futures: list):
+        remaining = [len(futures)]
+
+        def done(_):
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+                if last:
+                    self.handler_time[f"{name} + refresh"].append(time.perf_counter() - started)
+            if last:
+                self.advance(user_id)
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    # The user reads the reply and sends their next message
+    def advance(self, user_id: int):
+        with self._lock:
+            self.steps[user_id] += 1
+            finished = self.steps[user_id] >= len(self.scripts[user_id])
+            if finished:
+                self.finished_sessions += 1
+                if self.finished_sessions == len(self.scripts):
+                    self.done.set()
+        if not finished:
+            self.updates.put(self.make_update(user_id))
+
+    # Hands updates to telebot in batches, like one getUpdates response
+    def feed(self):
+        while not self.done.is_set():
+            try:
+                batch = [self.updates.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.updates.get_nowait())
+                except queue.Empty:
+                    break
+            self.bot.bot.process_new_updates(batch)
+
+    def arrive(self, ramp: float):
+        users = list(self.scripts)
+        started = time.perf_counter()
+        for index, user_id in enumerate(users):
+            due = started + ramp * index / len(users)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.updates.put(self.make_update(user_id))
+
+
+class DatabaseProbe:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = defaultdict(list)
+        self.checkouts = []
+        self.locked_errors = 0
+        self.max_checked_out = 0
+        self._lock = threading.Lock()
+
+    def install(self):
+        from sqlalchemy import event
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+        @event.listens_for(self.engine, "after_cursor_execute")
+        def after(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info["query_started"].pop()
+            kind = "read" if statement.lstrip().upper().startswith("SELECT") else "write"
+            with self._lock:
+                self.statements[kind].append(elapsed)
+
+        @event.listens_for(self.engine, "handle_error")
+        def error(context):
+            if "locked" in str(context.original_exception).lower():
+                with self._lock:
+                    self.locked_errors += 1
+
+        # Time spent waiting for a pooled connection
+        pool = self.engine.pool
+        connect = pool.connect
+
+        def timed_connect():
+            started = time.perf_counter()
+            connection = connect()
+            with self._lock:
+                self.checkouts.append(time.perf_counter() - started)
+                self.max_checked_out = max(self.max_checked_out, pool.checkedout())
+            return connection
+
+        pool.connect = timed_connect
+
+    def report(self) -> dict:
+        return {
+            "pool_checkout": summarize(self.checkouts),
+            "reads": summarize(self.statements["read"]),
+            "writes": summarize(self.statements["write"]),
+            "locked_errors": self.locked_errors,
+            "max_checked_out": self.max_checked_out
+        }
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def state_cache_bytes(store) -> int:
+    with store._lock:
+        entries = list(store._cache.items())
+    return sys.getsizeof(store._cache) + sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in entries)
+
+
+def sample_memory(bot, samples: list, stop: threading.Event):
+    while not stop.is_set():
+        samples.append({
+            "t": round(time.perf_counter(), 3),
+            "user_states": len(bot.user_states._cache),
+            "user_states_kb": round(state_cache_bytes(bot.user_states) / 1024, 1),
+            "rss_mb": round(current_rss_mb(), 1)
+        })
+        stop.wait(0.5)
+
+
+def print_report(report: dict):
+    print(f"{report['users']} users, {report['threads']} handler threads, "
+          f"{report['sessions_finished']} sessions finished in {report['elapsed_s']} s")
+    print(f"handler throughput: {report['handler_throughput_per_s']} updates/s, "
+          f"{report['session_throughput_per_s']} sessions/s")
+    print(f"{'':<30} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    rows = [("queue delay", report["queue_delay"])]
+    rows += [(f"handler {name}", stats) for name, stats in report["handlers"].items()]
+    rows += [(f"db {name}", report["database"][name]) for name in ("pool_checkout", "reads", "writes")]
+    for name, stats in rows:
+        print(f"{name:<30} {stats['count']:>7} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    database = report["database"]
+    print(f"db: {database['locked_errors']} 'database is locked' errors, "
+          f"at most {database['max_checked_out']} connections checked out")
+    memory = report["memory"]
+    print(f"user_states: {memory['user_states_start']} -> {memory['user_states_end']} entries, "
+          f"{memory['user_states_kb_end']} KB; RSS {memory['rss_mb_start']} -> {memory['rss_mb_end']} MB "
+          f"({memory['rss_kb_per_user']} KB per user)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=2, help="telebot worker threads (TeleBot's default is 2)")
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which users arrive")
+    parser.add_argument("--source-latency", type=float, default=0.2, help="seconds each stubbed source takes")
+    parser.add_argument("--queries", type=int, default=100, help="distinct keyword sets across users")
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--json", help="where to save results (default: benchmarks/results/load-<commit>.json)")
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    upstream = FakeUpstream()
+    upstream.start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        bot = configure(upstream, workdir)
+        import config
+        from telebot import util
+
+        stub_sources(args.source_latency)
+        probe = DatabaseProbe(config.engine)
+        probe.install()
+
+        bot.bot.threaded = True
+        bot.bot.worker_pool = util.ThreadPool(bot.bot, num_threads=args.threads)
+        run = LoadRun(bot, args.users, args.queries)
+        run.instrument()
+
+        samples = []
+        stop = threading.Event()
+        threading.Thread(target=sample_memory, args=(bot, samples, stop), daemon=True).start()
+        threading.Thread(target=run.feed, name="feeder", daemon=True).start()
+
+        started = time.perf_counter()
+        run.arrive(args.ramp)
+        run.done.wait(args.timeout)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        samples.append({
+            "t": round(time.perf_counter(), 3),
+            "user_states": len(bot.user_states._cache),
+            "user_states_kb": round(state_cache_bytes(bot.user_states) / 1024, 1),
+            "rss_mb": round(current_rss_mb(), 1)
+        })
+        bot.bot.worker_pool.close()
+        # Refreshes still running after a timeout must not outlive the temp dir and the fake upstream
+        bot.refresh_executor.shutdown(wait=True)
+        upstream.stop()
+
+    first, last = samples[0], samples[-1]
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "users": args.users,
+        "threads": args.threads,
+        "ramp_s": args.ramp,
+        "source_latency_s": args.source_latency,
+        "sessions_finished": run.finished_sessions,
+        "elapsed_s": round(elapsed, 2),
+        "handler_throughput_per_s": round(run.handled / elapsed, 1),
+        "session_throughput_per_s": round(run.finished_sessions / elapsed, 1),
+        "queue_delay": summarize(run.queue_delay),
+        "handlers": {name: summarize(times) for name, times in run.handler_time.items()},
+        "database": probe.report(),
+        "memory": {
+            "user_states_start": first["user_states"],
+            "user_states_end": last["user_states"],
+            "user_states_kb_end": last["user_states_kb"],
+            "rss_mb_start": first["rss_mb"],
+            "rss_mb_end": last["rss_mb"],
+            "rss_kb_per_user": round((last["rss_mb"] - first["rss_mb"]) * 1024 / args.users, 1),
+            "samples": samples
+        }
+    }
+    print_report(report)
+
+    path = args.json or os.path.join(BENCH_DIR, "results", f"load-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    main()
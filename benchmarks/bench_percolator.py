@@ -0,0 +1,211 @@
+# Percolator benchmark: compiles synthetic subscriptions, matches a batch of synthetic vacancies against
+# them and checks a sample of the results against a plain per-subscription loop.
+# Usage: python benchmarks/bench_percolator.py [--subscriptions 100000] [--vacancies 10000] [--check 200]
+#                                              [--seed 1] [--json out.json]
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_e2e import git_commit, summarize
+
+# Popular terms first: subscriptions pick them with Zipf-like weights
+KEYWORDS = [
+    "python", "java", "javascript", "golang", "data engineer", "devops", "react", "django", "sql", "kotlin",
+    "machine learning", "backend", "frontend", "qa", "android", "ios", "php", "c#", "typescript", "node.js",
+    "kubernetes", "aws", "scala", "rust", "spark", "airflow", "flutter", "vue", "linux", "postgresql",
+    "analyst", "product manager", "team lead", "architect", "1c", "unity", "data scientist", "mlops", "sre", "ruby"
+]
+TITLE_ROLES = ["developer", "engineer", "разработчик", "lead", "intern", "specialist"]
+LEVELS = ["Junior", "Middle", "Senior", "Lead", ""]
+FILLER = "опыт работы от года знание командная разработка code review удаленно офис гибкий график".split()
+COMPANIES = ["Контур", "Авито", "Ozon", "Яндекс", "Сбер", "Тинькофф", "EPAM", "JetBrains", "Acme", "Globex"]
+
+# (location text, HH area id or None for LinkedIn)
+PLACES = [
+    ("Москва", 1), ("Санкт-Петербург", 2), ("Казань", 88), ("Новосибирск", 4), ("Екатеринбург", 3),
+    ("Москва (remote)", 1), ("Moscow, Russia", None), ("New York, NY", None), ("Berlin, Germany", None),
+    ("London, United Kingdom", None), ("Remote", None)
+]
+SUBSCRIBER_LOCATIONS = ["remote", "moscow", "saint petersburg", "new york", "berlin", "london", "москва", "казань"]
+EXPERIENCE = ["noExperience", "between1And3", "between3And6", "moreThan6"]
+
+
+def weighted(rng: random.Random, items: list, k: int) -> list:
+    weights = [1 / (rank + 1) for rank in range(len(items))]
+    return list(dict.fromkeys(rng.choices(items, weights=weights, k=k)))
+
+def make_subscriptions(count: int, seed: int) -> dict:
+    from cache import SearchQuery
+    rng = random.Random(seed)
+    subscriptions = {}
+    for user_id in range(1, count + 1):
+        subscriptions[user_id] = SearchQuery(
+            keywords=tuple(sorted(weighted(rng, KEYWORDS, rng.choice((1, 1, 1, 2, 2, 3))))),
+            locations=tuple(sorted(rng.sample(SUBSCRIBER_LOCATIONS, rng.choice((1, 1, 2))))),
+            salary_min=rng.choice((0, 0, 50000, 100000, 150000, 200000, 300000)),
+            experience=rng.choice(EXPERIENCE + [None])
+        )
+    return subscriptions
+
+def make_vacancies(count: int, seed: int) -> list:
+    rng = random.Random(seed + 1)
+    vacancies = []
+    for number in range(count):
+        place, area_id = rng.choice(PLACES)
+        hh = area_id is not None
+        terms = weighted(rng, KEYWORDS, rng.randint(2, 6))
+        salary_from = rng.choice((None, 60000, 100000, 150000, 200000, 250000)) if hh else None
+        # Some HH postings pay in dollars
+        currency = rng.choice(("RUR", "RUR", "RUR", "USD")) if salary_from else None
+        if currency == "USD":
+            salary_from //= 80
+        vacancies.append({
+            "title": f"{rng.choice(LEVELS)} {terms[0].title()} {rng.choice(TITLE_ROLES)}".strip(),
+            "company": rng.choice(COMPANIES),
+            "description": " ".join(terms[1:] + rng.sample(FILLER, 6)),
+            "salary_from": salary_from,
+            "salary_to": salary_from and salary_from + rng.choice((0, 50000, 100000)) // (80 if currency == "USD" else 1),
+            "salary_currency": currency,
+            "experience": rng.choice(EXPERIENCE) if hh else None,
+            "location": place,
+            "area_id": area_id,
+            "source": "HeadHunter" if hh else "LinkedIn",
+            "url": f"https://example.com/vacancy/{number}"
+        })
+    return vacancies
+
+
+# The same rules written as a loop over every subscription, for checking and as the baseline
+def naive_match(subscriptions: dict, vacancy: dict) -> list:
+    from parsers.hh_areas import area_index
+    from parsers.hh_parser import resolve_area
+    from parsers.hh_currency import salary_rubles
+    from percolator import tokenize, vacancy_text
+    text = " " + " ".join(tokenize(vacancy_text(vacancy))) + " "
+    place = (vacancy.get("location") or "").casefold()
+    top = salary_rubles(vacancy)
+    hh = vacancy["source"] == "HeadHunter" and vacancy.get("area_id")
+    areas = area_index().ancestors(vacancy["area_id"]) if hh else set()
+    matched = []
+    for user_id, query in subscriptions.items():
+        phrases = [" ".join(tokenize(keyword)) for keyword in query.keywords]
+        if not all(f" {phrase} " in text for phrase in phrases if phrase):
+            continue
+        if top is not None and query.salary_min > top:
+            continue
+        if vacancy.get("experience") and query.experience and query.experience != vacancy["experience"]:
+            continue
+        if query.locations and not any(
+            location in place or resolve_area(location) in areas for location in query.locations
+        ):
+            continue
+        matched.append(user_id)
+    return matched
+
+
+def structure_bytes(percolator) -> int:
+    arrays = [percolator.user_ids, percolator.salary_min, percolator.experience, percolator.keyword_count,
+              percolator.no_keywords, percolator.no_locations]
+    arrays += list(percolator.single.values()) + list(percolator.multi.values()) + percolator.location_rows
+    return sum(array.nbytes for array in arrays)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--subscriptions", type=int, default=100000)
+    parser.add_argument("--vacancies", type=int, default=10000)
+    parser.add_argument("--check", type=int, default=200, help="vacancies compared with the per-subscription loop")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="where to save results (default: benchmarks/results/percolator-<commit>.json)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    import config
+    config.RESULT_CACHE_PATH = None
+    config.HH_HTTP_CACHE_PATH = ":memory:"
+    # Areas come from the bundled snapshot (or an existing cache) and are never downloaded
+    config.HH_AREAS_TTL = float("inf")
+    config.HH_CURRENCY_TTL = float("inf")
+    from percolator import Percolator
+
+    subscriptions = make_subscriptions(args.subscriptions, args.seed)
+    vacancies = make_vacancies(args.vacancies, args.seed)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    percolator = Percolator(subscriptions)
+    build_s = time.perf_counter() - started
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    per_vacancy = []
+    results = []
+    started = time.perf_counter()
+    for vacancy in vacancies:
+        vacancy_started = time.perf_counter()
+        results.extend(percolator.match([vacancy]))
+        per_vacancy.append(time.perf_counter() - vacancy_started)
+    single_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch_results = percolator.match(vacancies)
+    batch_s = time.perf_counter() - started
+    pairs = sum(len(matched) for matched in batch_results)
+
+    sample = vacancies[:args.check]
+    started = time.perf_counter()
+    expected = [naive_match(subscriptions, vacancy) for vacancy in sample]
+    naive_s = time.perf_counter() - started
+    mismatches = sum(
+        sorted(matched.tolist()) != wanted for matched, wanted in zip(batch_results, expected)
+    )
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "subscriptions": args.subscriptions,
+        "vacancies": args.vacancies,
+        "build_s": round(build_s, 3),
+        "build_peak_mb": round(build_peak / 1024 / 1024, 1),
+        "structure_mb": round(structure_bytes(percolator) / 1024 / 1024, 1),
+        "batch_s": round(batch_s, 3),
+        "batch_vacancies_per_s": round(args.vacancies / batch_s, 1),
+        "one_by_one_s": round(single_s, 3),
+        "per_vacancy": summarize(per_vacancy),
+        "matched_pairs": pairs,
+        "matched_per_vacancy": round(pairs / args.vacancies, 1),
+        "naive_s_per_vacancy": round(naive_s / max(len(sample), 1), 4),
+        "naive_estimated_batch_s": round(naive_s / max(len(sample), 1) * args.vacancies, 1),
+        "checked": len(sample),
+        "mismatches": mismatches
+    }
+
+    print(f"{args.subscriptions} subscriptions x {args.vacancies} vacancies")
+    print(f"compile: {report['build_s']} s, arrays {report['structure_mb']} MB, peak {report['build_peak_mb']} MB")
+    print(f"match batch: {report['batch_s']} s ({report['batch_vacancies_per_s']} vacancies/s), "
+          f"{report['matched_per_vacancy']} subscribers per vacancy")
+    stats = report["per_vacancy"]
+    print(f"per vacancy: p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    print(f"per-subscription loop: {report['naive_s_per_vacancy'] * 1000:.1f} ms per vacancy, "
+          f"~{report['naive_estimated_batch_s']} s for the batch")
+    print(f"checked {report['checked']} vacancies against the loop: {mismatches} mismatches")
+
+    path = args.json or os.path.join(BENCH_DIR, "results", f"percolator-{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"saved {path}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# Settings read/write throughput under concurrent threads.
+# Usage: python benchmarks/bench_settings_db.py [--url URL] [--threads 1 4 16] [--baseline]
+# --baseline uses the old engine setup (default rollback journal, no tuning) for comparison.
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from config import create_db_engine
+from database import get_user_settings, update_user_settings
+from models import Base
+
+USERS = 1000
+
+
+def worker(session_factory, ops: int, write_ratio: float, latencies: list, errors: list, seed: int):
+    rng = random.Random(seed)
+    local = []
+    for _ in range(ops):
+        user_id = rng.randrange(USERS)
+        started = time.perf_counter()
+        db = session_factory()
+        try:
+            if rng.random() < write_ratio:
+                update_user_settings(db, user_id, {"salary_min": rng.randrange(0, 500000)})
+            else:
+                get_user_settings(db, user_id)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+        local.append(time.perf_counter() - started)
+    latencies.extend(local)
+
+
+def run(url: str, thread_counts, ops: int, write_ratio: float, baseline: bool):
+    if baseline:
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+    else:
+        engine = create_db_engine(url)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autoflush=False, bind=engine)
+
+    db = session_factory()
+    for user_id in range(USERS):
+        update_user_settings(db, user_id, {
+            "keywords": ["Python"],
+            "locations": ["Remote"],
+            "salary_min": 50000,
+            "experience": "noExperience"
+        })
+    db.close()
+
+    print(f"{'threads':>8} {'ops/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'errors':>7}")
+    for threads in thread_counts:
+        latencies, errors = [], []
+        workers = [
+            threading.Thread(target=worker, args=(session_factory, ops, write_ratio, latencies, errors, i))
+            for i in range(threads)
+        ]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(
+            f"{threads:>8} {len(latencies) / elapsed:>10.0f} {statistics.median(latencies) * 1000:>8.2f} "
+            f"{p95 * 1000:>8.2f} {latencies[-1] * 1000:>8.2f} {len(errors):>7}"
+        )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="database URL (default: a temporary SQLite file)")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--ops", type=int, default=300, help="operations per thread")
+    parser.add_argument("--write-ratio", type=float, default=0.3)
+    parser.add_argument("--baseline", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or "sqlite:///" + os.path.join(tmp, "bench.db")
+        run(url, args.threads, args.ops, args.write_ratio, args.baseline)
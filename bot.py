@@ -1,23 +1,46 @@
+import html
 import telebot
 from telebot import types
 import logging
+from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
 from config import TELEGRAM_TOKEN, DEFAULT_SEARCH_PARAMS, SessionLocal
-from database import get_user_settings, update_user_settings
-from parsers.hh_parser import parse_hh
-from parsers.linkedin_parser import parse_linkedin
-from models import UserSettings
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    filename='log.log',
-    filemode='w',
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+from config import DEFAULT_SUBSCRIPTION_INTERVAL, MIN_SUBSCRIPTION_INTERVAL, MAX_SUBSCRIPTION_INTERVAL
+from config import LOCAL_INDEX_ENABLED, LOCAL_REFRESH_WORKERS
+from settings_repository import settings_repository
+from state_store import StateStore, DatabaseStateBackend
+from database import get_subscription, set_subscription, delete_subscription, select_new_vacancies
+from database import release_deliveries
+from scheduler import SubscriptionScheduler
+from dedup import Deduplicator
+from send_queue import SendQueue
+from digest import DigestStore, DIGEST_CALLBACK_PREFIX, escape_field, page_callback, parse_page_callback
+from search import SOURCES, SEARCH_DONE, SEARCH_ERROR, SEARCH_TIMEOUT, SEARCH_UNAVAILABLE, run_sources
+from vacancy_index import search_local, stale_sources, mark_refreshed
+from parsers.hh_areas import area_index
+from metrics import Gauge, register, setup_logging, span, start_metrics_server
+
+# Setup logging: records are written by a background thread, never on the handler thread
+setup_logging('log.log')
 logger = logging.getLogger(__name__)
 
 bot = telebot.TeleBot(TELEGRAM_TOKEN)
 
+# All outgoing messages go through the rate-limited queue so handlers never wait on Telegram
+send_queue = SendQueue()
+register(Gauge("jobbot_send_queue_depth", "Messages waiting to be sent", lambda: {(): send_queue.depth()}))
+
+def queue_send(chat_id: int, text: str, **kwargs) -> Future:
+    return send_queue.submit(chat_id, bot.send_message, chat_id, text, **kwargs)
+
+# message is a message id or the Future returned by queue_send; jobs for one
+# chat run in order, so that Future is already resolved when the edit runs
+def queue_edit(chat_id: int, message, text: str, **kwargs) -> Future:
+    def edit():
+        message_id = message.result().message_id if isinstance(message, Future) else message
+        return bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, **kwargs)
+    return send_queue.submit(chat_id, edit)
+
 # Conversation states
 class States:
     NONE = 0
@@ -26,7 +49,8 @@ class States:
     SALARY = 3
     EXPERIENCE = 4
 
-user_states = {}
+# Survives restarts and is shared by every worker process
+user_states = StateStore(DatabaseStateBackend())
 
 # Experience levels
 EXPERIENCE_LEVELS = {
@@ -37,47 +61,39 @@ EXPERIENCE_LEVELS = {
     }
 EXPERIENCE_REVERSE_MAP = {v: k for k, v in EXPERIENCE_LEVELS.items()}
 
+# Every field comes from a job board, so all of it is escaped for HTML mode
 def format_vacancy(vacancy: dict) -> str:
     return (
-    f"🏢 <b>{vacancy['company']}</b>\n"
-    f"🔹 <b>{vacancy['title']}</b>\n"
-    f"💰 Salary: {vacancy.get('salary', 'Not specified')}\n"
-    f"🌐 Source: {vacancy['source']}\n"
-    f"🔗 <a href='{vacancy['url']}'>View job</a>"
+    f"🏢 <b>{escape_field(vacancy['company'])}</b>\n"
+    f"🔹 <b>{escape_field(vacancy['title'])}</b>\n"
+    f"💰 Salary: {escape_field(vacancy.get('salary', 'Not specified'))}\n"
+    f"🌐 Source: {escape_field(vacancy['source'])}\n"
+    f"🔗 <a href=\"{html.escape(vacancy['url'] or '')}\">View job</a>"
     )
 
 def get_user_settings_with_defaults(user_id: int) -> dict:
-    db = SessionLocal()
     try:
-        settings = get_user_settings(db, user_id)
-        if settings:
-            return {
-                "keywords": settings.keywords,
-                "locations": settings.locations,
-                "salary_min": settings.salary_min,
-                "experience": settings.experience
-            }
-        return DEFAULT_SEARCH_PARAMS.copy()
+        settings = settings_repository.get_or_default(user_id)._asdict()
+        settings.pop("user_id")
+        return settings
 
     except Exception as e:
         logger.error(f"Error getting settings: {e}")
         return DEFAULT_SEARCH_PARAMS.copy()
 
-    finally:
-        db.close()
-
 
 @bot.message_handler(commands=['start'])
 def start(message):
     user_id = message.from_user.id
     user_states[user_id] = States.NONE
 
-    bot.reply_to(message,
+    queue_send(message.chat.id,
     "🔍 <b>Job Search Bot</b>\n\n"
     "I can help you find job openings!\n"
     "Use /settings to configure your search\n"
     "Use /search to find jobs\n"
     "Use /help for instructions",
+    reply_to_message_id=message.message_id,
     parse_mode="HTML")
 
 @bot.message_handler(commands=['help'])
@@ -87,6 +103,9 @@ def show_help(message):
     "/start - Start the bot\n"
     "/settings - Configure search parameters\n"
     "/search - Find jobs\n"
+    "/subscribe [minutes] - Get new jobs automatically\n"
+    "/interval <minutes> - Change how often to check\n"
+    "/unsubscribe - Stop automatic updates\n"
     "/help - Show this message\n\n"
     "Configure your job search with:\n"
     "- Keywords (e.g., Python, Java)\n"
@@ -94,7 +113,7 @@ def show_help(message):
     "- Minimum salary\n"
     "- Experience level"
     )
-    bot.send_message(message.chat.id, help_text, parse_mode="HTML")
+    queue_send(message.chat.id, help_text, parse_mode="HTML")
 
 @bot.message_handler(commands=['settings'])
 def settings(message):
@@ -113,29 +132,27 @@ def settings(message):
     types.KeyboardButton('Cancel')
     )
 
-    bot.send_message(
+    queue_send(
     user_id,
     "⚙️ <b>Settings Menu</b>\n\n"
     "Current settings:\n"
-    f"Keywords: {', '.join(current_settings['keywords'])}\n"
-    f"Locations: {', '.join(current_settings['locations'])}\n"
+    f"Keywords: {html.escape(', '.join(current_settings['keywords']))}\n"
+    f"Locations: {html.escape(', '.join(current_settings['locations']))}\n"
     f"Min Salary: {current_settings['salary_min']}\n"
     f"Experience: {EXPERIENCE_LEVELS.get(current_settings['experience'], current_settings['experience'])}",
     reply_markup=markup,
     parse_mode="HTML"
     )
 
-@bot.message_handler(func=lambda message: message.text == 'Change Keywords')
 def request_keywords(message):
     user_id = message.from_user.id
     user_states[user_id] = States.KEYWORDS
-    bot.send_message(
+    queue_send(
     user_id,
     "🔤 Enter job keywords separated by commas (e.g., Python, Django, Backend):",
     reply_markup=types.ReplyKeyboardRemove()
     )
 
-@bot.message_handler(func=lambda message: user_states.get(message.from_user.id) == States.KEYWORDS)
 def save_keywords(message):
     user_id = message.from_user.id
 
@@ -145,35 +162,23 @@ def save_keywords(message):
     keywords = [kw.strip() for kw in message.text.split(',') if kw.strip()]
 
     if not keywords:
-        bot.send_message(user_id, "⚠️ Please enter at least one keyword")
+        queue_send(user_id, "⚠️ Please enter at least one keyword")
         return
 
     if len(keywords) > 5:
-        bot.send_message(user_id, "⚠️ Please enter no more than 5 keywords")
+        queue_send(user_id, "⚠️ Please enter no more than 5 keywords")
         return
 
-    db = SessionLocal()
     try:
-        current_settings = get_user_settings(db, user_id)
-        if current_settings:
-            current_settings.keywords = keywords
-            db.commit()
-        else:
-            new_settings = DEFAULT_SEARCH_PARAMS.copy()
-            new_settings["keywords"] = keywords
-            update_user_settings(db, user_id, new_settings)
-
-            bot.send_message(user_id, "✅ Keywords updated!")
+        settings_repository.update(user_id, keywords=keywords)
+        queue_send(user_id, "✅ Keywords updated!")
     except Exception as e:
         logger.error(f"Error saving keywords: {e}")
-        bot.send_message(user_id, "⚠️ Error saving settings")
-    finally:
-        db.close()
+        queue_send(user_id, "⚠️ Error saving settings")
 
     user_states[user_id] = States.NONE
     settings(message)
 
-@bot.message_handler(func=lambda message: message.text == 'Change Locations')
 def request_locations(message):
     user_id = message.from_user.id
     user_states[user_id] = States.LOCATIONS
@@ -188,21 +193,31 @@ def request_locations(message):
     types.KeyboardButton('Cancel')
     )
 
-    bot.send_message(
+    queue_send(
     user_id,
     "🌍 Select location or enter custom one:",
     reply_markup=markup
     )
 
-@bot.message_handler(func=lambda message: user_states.get(message.from_user.id) == States.LOCATIONS)
+# Last unrecognised location a user typed; sending the same text again keeps it as typed
+location_drafts = {}
+
+# HH areas starting with what the user typed, unless it already names one
+def suggest_locations(text: str) -> list:
+    index = area_index()
+    if index.resolve(text) is not None:
+        return []
+    return index.suggest(text)
+
 def save_locations(message):
     user_id = message.from_user.id
+    draft = location_drafts.pop(user_id, None)
 
     if message.text == 'Cancel':
         return cancel_action(message)
 
     if message.text == 'Multiple Locations':
-        bot.send_message(
+        queue_send(
         user_id,
         "Enter locations separated by commas (e.g., Remote, Moscow, New York):",
         reply_markup=types.ReplyKeyboardRemove()
@@ -212,35 +227,35 @@ def save_locations(message):
     locations = [loc.strip() for loc in message.text.split(',') if loc.strip()]
 
     if not locations:
-        bot.send_message(user_id, "⚠️ Please enter at least one location")
+        queue_send(user_id, "⚠️ Please enter at least one location")
         return
 
     if len(locations) > 3:
-        bot.send_message(user_id, "⚠️ Please enter no more than 3 locations")
+        queue_send(user_id, "⚠️ Please enter no more than 3 locations")
         return
 
-    db = SessionLocal()
-    try:
-        current_settings = get_user_settings(db, user_id)
-        if current_settings:
-            current_settings.locations = locations
-            db.commit()
-        else:
-            new_settings = DEFAULT_SEARCH_PARAMS.copy()
-            new_settings["locations"] = locations
-            update_user_settings(db, user_id, new_settings)
+    suggestions = suggest_locations(locations[0]) if len(locations) == 1 and locations[0] != draft else []
+    if suggestions:
+        location_drafts[user_id] = locations[0]
+        markup = types.ReplyKeyboardMarkup(row_width=2)
+        markup.add(*[types.KeyboardButton(name) for name in suggestions], types.KeyboardButton('Cancel'))
+        queue_send(
+        user_id,
+        f"🔎 Did you mean one of these? Send \"{locations[0]}\" again to keep it as typed.",
+        reply_markup=markup
+        )
+        return
 
-            bot.send_message(user_id, "✅ Locations updated!")
+    try:
+        settings_repository.update(user_id, locations=locations)
+        queue_send(user_id, "✅ Locations updated!")
     except Exception as e:
         logger.error(f"Error saving locations: {e}")
-        bot.send_message(user_id, "⚠️ Error saving settings")
-    finally:
-        db.close()
+        queue_send(user_id, "⚠️ Error saving settings")
 
     user_states[user_id] = States.NONE
     settings(message)
 
-@bot.message_handler(func=lambda message: message.text == 'Change Salary')
 def request_salary(message):
     user_id = message.from_user.id
     user_states[user_id] = States.SALARY
@@ -255,13 +270,12 @@ def request_salary(message):
     types.KeyboardButton('Cancel')
     )
 
-    bot.send_message(
+    queue_send(
     user_id,
     "💰 Enter minimum salary (RUB):",
     reply_markup=markup
     )
 
-@bot.message_handler(func=lambda message: user_states.get(message.from_user.id) == States.SALARY)
 def save_salary(message):
     user_id = message.from_user.id
 
@@ -269,7 +283,7 @@ def save_salary(message):
         return cancel_action(message)
 
     if message.text == 'Custom Amount':
-        bot.send_message(
+        queue_send(
         user_id,
         "Enter custom minimum salary amount in RUB:",
         reply_markup=types.ReplyKeyboardRemove()
@@ -277,42 +291,30 @@ def save_salary(message):
         return
 
     if not message.text.isdigit():
-        bot.send_message(user_id, "⚠️ Please enter a valid number")
+        queue_send(user_id, "⚠️ Please enter a valid number")
         return
 
     salary = int(message.text)
 
     if salary < 0:
-        bot.send_message(user_id, "⚠️ Salary cannot be negative")
+        queue_send(user_id, "⚠️ Salary cannot be negative")
         return
 
     if salary > 1000000:
-        bot.send_message(user_id, "⚠️ Please enter a reasonable salary amount")
+        queue_send(user_id, "⚠️ Please enter a reasonable salary amount")
         return
 
-    db = SessionLocal()
     try:
-        current_settings = get_user_settings(db, user_id)
-        if current_settings:
-            current_settings.salary_min = salary
-            db.commit()
-        else:
-            new_settings = DEFAULT_SEARCH_PARAMS.copy()
-            new_settings["salary_min"] = salary
-            update_user_settings(db, user_id, new_settings)
-
-            bot.send_message(user_id, f"✅ Minimum salary set to {salary} RUB!")
+        settings_repository.update(user_id, salary_min=salary)
+        queue_send(user_id, f"✅ Minimum salary set to {salary} RUB!")
     except Exception as e:
         logger.error(f"Error saving salary: {e}")
-        bot.send_message(user_id, "⚠️ Error saving settings")
-    finally:
-        db.close()
+        queue_send(user_id, "⚠️ Error saving settings")
 
     user_states[user_id] = States.NONE
     settings(message)
 
 
-@bot.message_handler(func=lambda message: message.text == 'Change Experience')
 def request_experience(message):
     user_id = message.from_user.id
     user_states[user_id] = States.EXPERIENCE
@@ -324,14 +326,13 @@ def request_experience(message):
     ]
     markup.add(*buttons, types.KeyboardButton('Cancel'))
 
-    bot.send_message(
+    queue_send(
         user_id,
         "👔 <b>Select your experience level:</b>",
         reply_markup=markup,
         parse_mode="HTML"
     )
 
-@bot.message_handler(func=lambda message: user_states.get(message.from_user.id) == States.EXPERIENCE)
 def save_experience(message):
     user_id = message.from_user.id
 
@@ -340,7 +341,7 @@ def save_experience(message):
         return
 
     if message.text not in EXPERIENCE_REVERSE_MAP:
-        bot.send_message(
+        queue_send(
             user_id,
             "⚠️ Please select an option from the keyboard below:",
             reply_markup=types.ReplyKeyboardMarkup(
@@ -353,19 +354,10 @@ def save_experience(message):
         )
         return
 
-    db = SessionLocal()
     try:
-        settings = get_user_settings(db, user_id) or UserSettings(
-            user_id=user_id,
-            **DEFAULT_SEARCH_PARAMS
-        )
-
-        settings.experience = EXPERIENCE_REVERSE_MAP[message.text]
+        settings_repository.update(user_id, experience=EXPERIENCE_REVERSE_MAP[message.text])
 
-        db.add(settings)
-        db.commit()
-
-        bot.send_message(
+        queue_send(
             user_id,
             f"✅ Experience level set to <b>{message.text}</b>!",
             parse_mode="HTML",
@@ -374,56 +366,39 @@ def save_experience(message):
 
     except Exception as e:
         logger.error(f"Error saving experience: {str(e)}", exc_info=True)
-        bot.send_message(
+        queue_send(
             user_id,
             "⚠️ Failed to save experience level. Please try again."
         )
-    finally:
-        db.close()
 
     user_states[user_id] = States.NONE
     show_settings(message)
 
 
-@bot.message_handler(func=lambda message: message.text == 'Show Current Settings')
 def show_settings(message):
     user_id = message.from_user.id
 
-    db = SessionLocal()
     try:
-        current_settings = get_user_settings(db, user_id)
-
-        if current_settings:
-            current_settings = {
-                'keywords': current_settings.keywords,
-                'locations': current_settings.locations,
-                'salary_min': current_settings.salary_min,
-                'experience': current_settings.experience
-            }
-        else:
-            current_settings = DEFAULT_SEARCH_PARAMS.copy()
+        current_settings = get_user_settings_with_defaults(user_id)
 
-        bot.send_message(
+        queue_send(
             user_id,
             "⚙️ <b>Current Settings</b>\n\n"
-            f"Keywords: {', '.join(current_settings['keywords'])}\n"
-            f"Locations: {', '.join(current_settings['locations'])}\n"
+            f"Keywords: {html.escape(', '.join(current_settings['keywords']))}\n"
+            f"Locations: {html.escape(', '.join(current_settings['locations']))}\n"
             f"Min Salary: {current_settings['salary_min']} RUB\n"
             f"Experience: {EXPERIENCE_LEVELS.get(current_settings['experience'], current_settings['experience'])}",
             parse_mode="HTML"
         )
     except Exception as e:
         logger.error(f"Error showing settings: {e}")
-        bot.send_message(user_id, "⚠️ Error loading settings")
-    finally:
-        db.close()
+        queue_send(user_id, "⚠️ Error loading settings")
 
 
-@bot.message_handler(func=lambda message: message.text == 'Cancel')
 def cancel_action(message):
     user_id = message.from_user.id
     user_states[user_id] = States.NONE
-    bot.send_message(
+    queue_send(
     user_id,
     "❌ Action cancelled\n"
         "Use /settings to configure your search\n"
@@ -432,55 +407,322 @@ def cancel_action(message):
     reply_markup=types.ReplyKeyboardRemove()
     )
 
+def format_search_status(statuses: dict) -> str:
+    return "\n".join(f"{name}: {status}" for name, status in statuses.items())
+
+digest_store = DigestStore()
+
+def digest_keyboard(digest):
+    if len(digest.pages) < 2:
+        return None
+    markup = types.InlineKeyboardMarkup(row_width=3)
+    markup.add(
+    types.InlineKeyboardButton('◀️ Prev', callback_data=page_callback(digest, digest.page - 1)),
+    types.InlineKeyboardButton(f'{digest.page + 1}/{len(digest.pages)}', callback_data=page_callback(digest, digest.page)),
+    types.InlineKeyboardButton('Next ▶️', callback_data=page_callback(digest, digest.page + 1))
+    )
+    return markup
+
+# Vacancies are claimed as delivered before they are sent; if Telegram never takes the
+# message, the claim is given back so the next search or poll shows them again
+def release_on_failure(user_id: int, vacancies: list, sent: Future):
+    vacancy_ids = [vacancy["vacancy_id"] for vacancy in vacancies if vacancy.get("vacancy_id")]
+    if not vacancy_ids:
+        return
+
+    def release(future: Future):
+        if future.cancelled() or future.exception() is None:
+            return
+        db = SessionLocal()
+        try:
+            release_deliveries(db, user_id, vacancy_ids)
+            logger.warning(f"Digest for {user_id} was not sent, {len(vacancy_ids)} jobs will be shown again")
+        except Exception as e:
+            logger.error(f"Error releasing deliveries: {e}")
+        finally:
+            db.close()
+
+    sent.add_done_callback(release)
+
+# Sends vacancies as one paged digest message; passing an existing digest appends to it in place
+def send_digest(user_id: int, vacancies: list, title: str, digest=None):
+    if not vacancies:
+        return digest
+
+    if digest is None:
+        digest = digest_store.create(user_id, title)
+    digest.extend([format_vacancy(vacancy) for vacancy in vacancies])
+    text = digest.render()
+
+    if digest.message is None:
+        digest.message = sent = queue_send(
+        user_id,
+        text,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
+        reply_markup=digest_keyboard(digest)
+        )
+    else:
+        sent = queue_edit(
+        user_id,
+        digest.message,
+        text,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
+        reply_markup=digest_keyboard(digest)
+        )
+    release_on_failure(user_id, vacancies, sent)
+    return digest
+
+@bot.callback_query_handler(func=lambda call: call.data and call.data.startswith(DIGEST_CALLBACK_PREFIX + ":"))
+def turn_digest_page(call):
+    try:
+        digest_id, page = parse_page_callback(call.data)
+    except ValueError:
+        bot.answer_callback_query(call.id)
+        return
+
+    digest = digest_store.get(digest_id)
+    if digest is None:
+        bot.answer_callback_query(call.id, "These results have expired. Use /search again.")
+        return
+
+    if not 0 <= page < len(digest.pages) or page == digest.page:
+        bot.answer_callback_query(call.id)
+        return
+
+    queue_edit(
+    call.message.chat.id,
+    call.message.message_id,
+    digest.render(page),
+    parse_mode="HTML",
+    disable_web_page_preview=True,
+    reply_markup=digest_keyboard(digest)
+    )
+    bot.answer_callback_query(call.id)
+
+def filter_new_vacancies(user_id: int, vacancies: list) -> list:
+    db = SessionLocal()
+    try:
+        # Results from the local index are stored already and carry their ids
+        vacancy_ids = [vacancy.get("vacancy_id") for vacancy in vacancies]
+        if None in vacancy_ids:
+            vacancy_ids = None
+        return select_new_vacancies(db, user_id, vacancies, vacancy_ids)
+    except Exception as e:
+        logger.error(f"Error checking delivered vacancies: {e}")
+        return vacancies
+    finally:
+        db.close()
+
+SEARCHING = "still searching…"
+UP_TO_DATE = "up to date"
+LOCAL_INDEX = "Saved jobs"
+
+# Status message and digest of one /search, updated as each source reports back
+class SearchProgress:
+    def __init__(self, user_id: int, statuses: Optional[dict] = None):
+        self.user_id = user_id
+        self.statuses = statuses if statuses is not None else {name: SEARCHING for name in SOURCES}
+        self.total = 0
+        self.fresh_total = 0
+        # The same job is often posted on several boards; only deliver it once
+        self.deduplicator = Deduplicator()
+        self.digest = None
+        self.status = queue_send(user_id, "🔍 Searching for jobs...\n\n" + format_search_status(self.statuses))
+
+    def update(self, name: str, outcome: str, vacancies: list):
+        vacancies = self.deduplicator.add(vacancies)
+        fresh = filter_new_vacancies(self.user_id, vacancies)
+        if outcome == SEARCH_DONE:
+            self.statuses[name] = f"{len(vacancies)} found, {len(fresh)} new"
+        elif outcome == SEARCH_TIMEOUT:
+            self.statuses[name] = "timed out"
+        elif outcome == SEARCH_UNAVAILABLE:
+            self.statuses[name] = "temporarily unavailable"
+        else:
+            self.statuses[name] = "failed"
+        self.total += len(vacancies)
+        self.fresh_total += len(fresh)
+
+        searching = SEARCHING in self.statuses.values()
+        header = "🔍 Searching for jobs..." if searching else f"✅ Found {self.fresh_total} new jobs:"
+        if not searching and not self.total:
+            header = "😕 No jobs found with current settings. Try adjusting your search criteria."
+        elif not searching and not self.fresh_total:
+            header = "👌 No new jobs since your last search."
+
+        queue_edit(self.user_id, self.status, header + "\n\n" + format_search_status(self.statuses))
+
+        # Deliver each source's results as soon as they arrive, in one digest message
+        self.digest = send_digest(self.user_id, fresh, "📋 <b>New jobs</b>", self.digest)
+
+# Upstream refreshes run here, so the /search handler returns once the local answer is out
+refresh_executor = ThreadPoolExecutor(max_workers=LOCAL_REFRESH_WORKERS, thread_name_prefix="refresh")
+
+# Saved jobs first, then the sources whose results for this query are stale
+def start_search(user_id: int, settings):
+    stale = stale_sources(settings, SOURCES)
+    statuses = {LOCAL_INDEX: SEARCHING}
+    statuses.update((name, SEARCHING if name in stale else UP_TO_DATE) for name in SOURCES)
+    progress = SearchProgress(user_id, statuses)
+
+    try:
+        vacancies = search_local(settings)
+    except Exception as e:
+        logger.error(f"Local index search error: {e}")
+        progress.update(LOCAL_INDEX, SEARCH_ERROR, [])
+    else:
+        with span("deliver_results", source=LOCAL_INDEX):
+            progress.update(LOCAL_INDEX, SEARCH_DONE, vacancies)
+    return progress, stale
+
+def refresh_sources(progress: SearchProgress, settings, names: list):
+    try:
+        for name, outcome, vacancies in run_sources(settings, {name: SOURCES[name] for name in names}):
+            with span("deliver_results", source=name):
+                progress.update(name, outcome, vacancies)
+            if outcome == SEARCH_DONE:
+                mark_refreshed(name, settings)
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        queue_send(progress.user_id, "⚠️ Error occurred while searching")
+
 @bot.message_handler(commands=['search'])
 def search_jobs(message):
     user_id = message.from_user.id
 
     bot.send_chat_action(user_id, 'typing')
-    msg = bot.send_message(user_id, "🔍 Searching for jobs...")
 
     try:
-        vacancies = []
-        vacancies.extend(parse_hh(user_id))
-        vacancies.extend(parse_linkedin(user_id))
-
-        if not vacancies:
-            bot.edit_message_text(
-            "😕 No jobs found with current settings. Try adjusting your search criteria.",
-            chat_id=user_id,
-            message_id=msg.message_id
-            )
-            return
+        with span("search"):
+            with span("settings"):
+                settings = settings_repository.get_or_default(user_id)
+            if not LOCAL_INDEX_ENABLED:
+                refresh_sources(SearchProgress(user_id), settings, list(SOURCES))
+                return
+            progress, stale = start_search(user_id, settings)
 
-        bot.edit_message_text(
-        f"✅ Found {len(vacancies)} jobs:",
-        chat_id=user_id,
-        message_id=msg.message_id
+        if stale:
+            refresh_executor.submit(refresh_sources, progress, settings, stale)
+
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        queue_send(user_id, "⚠️ Error occurred while searching")
+
+def notify_subscriber(user_id: int, vacancies: list):
+    send_digest(user_id, vacancies, f"🔔 <b>{len(vacancies)} new jobs matching your settings</b>")
+
+scheduler = SubscriptionScheduler(notify=notify_subscriber)
+
+def parse_interval(message):
+    parts = message.text.split()
+    if len(parts) < 2:
+        return None
+    if not parts[1].isdigit():
+        raise ValueError
+    interval = int(parts[1])
+    if not MIN_SUBSCRIPTION_INTERVAL <= interval <= MAX_SUBSCRIPTION_INTERVAL:
+        raise ValueError
+    return interval
+
+@bot.message_handler(commands=['subscribe', 'interval'])
+def subscribe(message):
+    user_id = message.from_user.id
+
+    try:
+        interval = parse_interval(message)
+    except ValueError:
+        queue_send(
+        user_id,
+        f"⚠️ Interval must be between {MIN_SUBSCRIPTION_INTERVAL} and {MAX_SUBSCRIPTION_INTERVAL} minutes"
         )
+        return
 
-        for vacancy in vacancies:
-            try:
-                bot.send_message(
-                user_id,
-                format_vacancy(vacancy),
-                parse_mode="HTML",
-                disable_web_page_preview=True
-                )
-            except Exception as e:
-                logger.error(f"Error sending vacancy: {e}")
-                continue
+    db = SessionLocal()
+    try:
+        current = get_subscription(db, user_id)
+        if interval is None:
+            if message.text.startswith('/interval'):
+                queue_send(user_id, "⚠️ Usage: /interval <minutes>")
+                return
+            interval = current.interval_minutes if current else DEFAULT_SUBSCRIPTION_INTERVAL
+
+        if settings_repository.get(user_id) is None:
+            settings_repository.update(user_id)
+        set_subscription(db, user_id, interval)
+
+        queue_send(
+        user_id,
+        f"🔔 You'll get new jobs every {interval} minutes.\n"
+        "Use /unsubscribe to stop."
+        )
+    except Exception as e:
+        logger.error(f"Error saving subscription: {e}")
+        queue_send(user_id, "⚠️ Error saving subscription")
+    finally:
+        db.close()
 
+@bot.message_handler(commands=['unsubscribe'])
+def unsubscribe(message):
+    user_id = message.from_user.id
+
+    db = SessionLocal()
+    try:
+        if delete_subscription(db, user_id):
+            queue_send(user_id, "🔕 Automatic updates stopped")
+        else:
+            queue_send(user_id, "You are not subscribed. Use /subscribe to start.")
     except Exception as e:
-        logger.error(f"Search error: {e}")
-        bot.send_message(user_id, "⚠️ Error occurred while searching")
+        logger.error(f"Error removing subscription: {e}")
+        queue_send(user_id, "⚠️ Error removing subscription")
+    finally:
+        db.close()
+
+# Text routing: one dict lookup by button text, then one by conversation state
+BUTTON_HANDLERS = {
+    'Change Keywords': request_keywords,
+    'Change Locations': request_locations,
+    'Change Salary': request_salary,
+    'Change Experience': request_experience,
+    'Show Current Settings': show_settings,
+}
+
+STATE_HANDLERS = {
+    States.KEYWORDS: save_keywords,
+    States.LOCATIONS: save_locations,
+    States.SALARY: save_salary,
+    States.EXPERIENCE: save_experience,
+}
+
+# Registered last so command handlers are matched first
+@bot.message_handler(content_types=['text'])
+def route_text(message):
+    handler = BUTTON_HANDLERS.get(message.text)
+    if handler is None:
+        handler = STATE_HANDLERS.get(user_states.get(message.from_user.id))
+    if handler is None and message.text == 'Cancel':
+        handler = cancel_action
+    if handler is not None:
+        handler(message)
 
 if __name__ == "__main__":
     from models import Base
-    from config import engine
+    from config import engine, LINKEDIN_HTTP_ENABLED, METRICS_ENABLED
+    from parsers.driver_pool import driver_pool
+    import threading
 
     # Create database tables
     Base.metadata.create_all(bind=engine)
 
+    # Start LinkedIn browsers in the background so the first search doesn't pay for it.
+    # In HTTP mode they are only a fallback and start on first use
+    if not LINKEDIN_HTTP_ENABLED:
+        threading.Thread(target=driver_pool.warm, name="driver-warmup", daemon=True).start()
+    scheduler.start()
+    if METRICS_ENABLED:
+        start_metrics_server()
+
     logger.info("Starting bot...")
     print("Starting bot...")
     while True:
@@ -0,0 +1,179 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import RESULT_CACHE_TTLS, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_PATH, SALARY_BUCKET
+from config import SOURCE_TIMEOUTS, DEFAULT_SOURCE_TIMEOUT
+from metrics import event
+from parsers.hh_currency import salary_rubles
+from singleflight import SingleFlight, AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Normalized form of UserSettings: equivalent settings produce equal queries
+SearchQuery = namedtuple("SearchQuery", ["keywords", "locations", "salary_min", "experience"])
+
+def normalize_terms(terms: List[str]) -> tuple:
+    return tuple(sorted({term.strip().casefold() for term in terms if term.strip()}))
+
+# The salary is rounded down to its bucket so nearby minimums share one upstream search;
+# results are cut to each user's exact minimum with filter_salary afterwards
+def normalize_query(settings) -> SearchQuery:
+    return SearchQuery(
+        keywords=normalize_terms(settings.keywords),
+        locations=normalize_terms(settings.locations),
+        salary_min=(settings.salary_min or 0) // SALARY_BUCKET * SALARY_BUCKET,
+        experience=settings.experience
+    )
+
+# Vacancies that state no salary are kept, as the boards do; the minimum is in rubles
+def meets_salary(vacancy: Dict, salary_min: Optional[int]) -> bool:
+    top = salary_rubles(vacancy)
+    return not salary_min or top is None or top >= salary_min
+
+def filter_salary(vacancies: List[Dict], salary_min: Optional[int]) -> List[Dict]:
+    if not salary_min:
+        return vacancies
+    return [vacancy for vacancy in vacancies if meets_salary(vacancy, salary_min)]
+
+
+class ResultCache:
+    def __init__(self, ttls: Dict[str, float], max_bytes: int, path: Optional[str] = None):
+        self.ttls = ttls
+        self.max_bytes = max_bytes
+        self.hits = Counter()
+        self.misses = Counter()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                "key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            self._db.commit()
+
+    def _key(self, source: str, query: SearchQuery) -> str:
+        return json.dumps([source, *query])
+
+    def get(self, source: str, query: SearchQuery) -> Optional[List[Dict]]:
+        key = self._key(source, query)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits[source] += 1
+                    return json.loads(payload)
+                self._evict(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT expires_at, payload FROM result_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[0] > now:
+                    self._remember(key, row[0], row[1])
+                    self.hits[source] += 1
+                    return json.loads(row[1])
+
+            self.misses[source] += 1
+            return None
+
+    def set(self, source: str, query: SearchQuery, vacancies: List[Dict]):
+        key = self._key(source, query)
+        expires_at = time.time() + self.ttls.get(source, 0)
+        payload = json.dumps(vacancies)
+
+        with self._lock:
+            self._remember(key, expires_at, payload)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO result_cache (key, expires_at, payload) VALUES (?, ?, ?)",
+                        (key, expires_at, payload)
+                    )
+                    self._db.execute("DELETE FROM result_cache WHERE expires_at <= ?", (time.time(),))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Result cache write failed: {e}")
+
+    def _remember(self, key: str, expires_at: float, payload: str):
+        if key in self._entries:
+            self._evict(key)
+        if len(payload) > self.max_bytes:
+            return
+
+        self._entries[key] = (expires_at, payload)
+        self._bytes += len(payload)
+        # Least recently used entries go first once the memory budget is exceeded
+        while self._bytes > self.max_bytes:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, key: str):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": dict(self.hits),
+                "misses": dict(self.misses)
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_TTLS, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_PATH)
+search_flight = SingleFlight()
+async_search_flight = AsyncSingleFlight()
+
+def cached_search(source: str, search: Callable[[SearchQuery], List[Dict]], settings) -> List[Dict]:
+    query = normalize_query(settings)
+    vacancies = result_cache.get(source, query)
+    if vacancies is not None:
+        event("result_cache_hit", source=source)
+        return filter_salary(vacancies, settings.salary_min)
+    event("result_cache_miss", source=source)
+
+    def fetch():
+        # Errors propagate to every waiter and are never cached
+        result = search(query)
+        result_cache.set(source, query, result)
+        return result
+
+    # Identical searches that miss the cache at the same time share one upstream fetch
+    vacancies = search_flight.do(
+        (source, query),
+        fetch,
+        timeout=SOURCE_TIMEOUTS.get(source, DEFAULT_SOURCE_TIMEOUT)
+    )
+    return filter_salary(vacancies, settings.salary_min)
+
+async def cached_search_async(source: str, search: Callable[[SearchQuery], Awaitable[List[Dict]]], settings) -> List[Dict]:
+    query = normalize_query(settings)
+    vacancies = result_cache.get(source, query)
+    if vacancies is not None:
+        event("result_cache_hit", source=source)
+        return filter_salary(vacancies, settings.salary_min)
+    event("result_cache_miss", source=source)
+
+    async def fetch():
+        result = await search(query)
+        result_cache.set(source, query, result)
+        return result
+
+    vacancies = await async_search_flight.do(
+        (source, query),
+        fetch,
+        timeout=SOURCE_TIMEOUTS.get(source, DEFAULT_SOURCE_TIMEOUT)
+    )
+    return filter_salary(vacancies, settings.salary_min)
@@ -1,5 +1,16 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from models import UserSettings
+from config import VACANCY_BATCH_SIZE
+from models import UserSettings, Subscription, Vacancy, VacancyDocument, Delivery
+from parsers.hh_currency import salary_rubles
+
+LINKEDIN_JOB_ID = re.compile(r"/jobs/view/(?:[^/?#]*-)?(\d+)")
 
 def get_user_settings(db: Session, user_id: int):
     return db.query(UserSettings).filter(UserSettings.user_id == user_id).first()
@@ -24,3 +35,203 @@ def update_user_settings(db: Session, user_id: int, settings: dict):
     db.refresh(db_settings)
     return db_settings
 
+def get_subscription(db: Session, user_id: int):
+    return db.query(Subscription).filter(Subscription.user_id == user_id).first()
+
+def set_subscription(db: Session, user_id: int, interval_minutes: int):
+    subscription = get_subscription(db, user_id)
+    if subscription:
+        subscription.interval_minutes = interval_minutes
+    else:
+        subscription = Subscription(user_id=user_id, interval_minutes=interval_minutes)
+    db.add(subscription)
+    db.commit()
+    return subscription
+
+def delete_subscription(db: Session, user_id: int) -> bool:
+    deleted = db.query(Subscription).filter(Subscription.user_id == user_id).delete()
+    db.commit()
+    return bool(deleted)
+
+def get_active_subscriptions(db: Session):
+    return (
+        db.query(UserSettings, Subscription)
+        .join(Subscription, Subscription.user_id == UserSettings.user_id)
+        .all()
+    )
+
+def vacancy_fingerprint(vacancy: Dict) -> str:
+    if vacancy.get("external_id"):
+        key = f"{vacancy['source']}:{vacancy['external_id']}"
+    else:
+        url = vacancy.get("url") or ""
+        match = LINKEDIN_JOB_ID.search(url)
+        if match:
+            key = f"LinkedIn:{match.group(1)}"
+        else:
+            # Tracking parameters differ between searches, so they are not part of the identity
+            parts = urlsplit(url)
+            key = f"{parts.netloc.lower()}{parts.path.rstrip('/')}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def upsert_statement(db: Session, table):
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+# Inserts or refreshes vacancies in batches; returns their ids in input order
+def upsert_vacancies(db: Session, vacancies: List[Dict]) -> List[int]:
+    now = datetime.utcnow()
+    fingerprints = [vacancy_fingerprint(vacancy) for vacancy in vacancies]
+    rows = {}
+    for fingerprint, vacancy in zip(fingerprints, vacancies):
+        rows[fingerprint] = {
+            "fingerprint": fingerprint,
+            "source": vacancy["source"],
+            "title": vacancy.get("title") or "Not specified",
+            "company": vacancy.get("company") or "Not specified",
+            "salary": vacancy.get("salary"),
+            "url": vacancy.get("url") or "",
+            "first_seen_at": now,
+            "last_seen_at": now
+        }
+
+    ids = {}
+    unique = list(rows.values())
+    for start in range(0, len(unique), VACANCY_BATCH_SIZE):
+        batch = unique[start:start + VACANCY_BATCH_SIZE]
+        stmt = upsert_statement(db, Vacancy.__table__).values(batch)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Vacancy.fingerprint],
+            set_={
+                "title": stmt.excluded.title,
+                "company": stmt.excluded.company,
+                "salary": stmt.excluded.salary,
+                "url": stmt.excluded.url,
+                "last_seen_at": stmt.excluded.last_seen_at
+            }
+        )
+        db.execute(stmt)
+
+        keys = [row["fingerprint"] for row in batch]
+        ids.update(
+            db.query(Vacancy.fingerprint, Vacancy.id).filter(Vacancy.fingerprint.in_(keys)).all()
+        )
+
+    index_vacancies(db, vacancies, [ids[fingerprint] for fingerprint in fingerprints])
+    db.commit()
+    return [ids[fingerprint] for fingerprint in fingerprints]
+
+# HH sends "2024-05-02T10:20:00+0300", LinkedIn "2024-05-02"; stored as naive UTC
+def parse_posted_at(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    for pattern in ("%Y-%m-%dT%H:%M:%S%z", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, pattern)
+        except ValueError:
+            continue
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    return None
+
+# Refreshes the searchable fields of stored vacancies; the caller commits
+def index_vacancies(db: Session, vacancies: List[Dict], vacancy_ids: List[int]):
+    documents = {}
+    for vacancy_id, vacancy in zip(vacancy_ids, vacancies):
+        location = vacancy.get("location")
+        documents[vacancy_id] = ({
+            "vacancy_id": vacancy_id,
+            "description": vacancy.get("description") or "",
+            "salary_from": vacancy.get("salary_from"),
+            "salary_to": vacancy.get("salary_to"),
+            "salary_currency": vacancy.get("salary_currency"),
+            "salary_rub": salary_rubles(vacancy),
+            "experience": vacancy.get("experience"),
+            "area": location.casefold() if location else None,
+            "area_id": vacancy.get("area_id"),
+            "posted_at": parse_posted_at(vacancy.get("posted_at"))
+        }, vacancy)
+
+    unique = list(documents.items())
+    for start in range(0, len(unique), VACANCY_BATCH_SIZE):
+        batch = unique[start:start + VACANCY_BATCH_SIZE]
+        stmt = upsert_statement(db, VacancyDocument.__table__).values([row for _, (row, _) in batch])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VacancyDocument.vacancy_id],
+            set_={
+                column: getattr(stmt.excluded, column)
+                for column in (
+                    "description", "salary_from", "salary_to", "salary_currency", "salary_rub",
+                    "experience", "area", "area_id", "posted_at"
+                )
+            }
+        )
+        db.execute(stmt)
+
+        if db.bind.dialect.name == "sqlite":
+            # FTS5 has no upsert: replace the rows
+            db.execute(text("DELETE FROM vacancy_fts WHERE rowid = :id"), [{"id": vacancy_id} for vacancy_id, _ in batch])
+            db.execute(
+                text("INSERT INTO vacancy_fts (rowid, title, company, description) VALUES (:id, :title, :company, :description)"),
+                [
+                    {
+                        "id": vacancy_id,
+                        "title": vacancy.get("title") or "",
+                        "company": vacancy.get("company") or "",
+                        "description": row["description"]
+                    }
+                    for vacancy_id, (row, vacancy) in batch
+                ]
+            )
+
+# Returns the ids not yet delivered to the user and records them as delivered
+def claim_deliveries(db: Session, user_id: int, vacancy_ids: List[int]) -> Set[int]:
+    new_ids = set()
+    unique = list(dict.fromkeys(vacancy_ids))
+    for start in range(0, len(unique), VACANCY_BATCH_SIZE):
+        batch = unique[start:start + VACANCY_BATCH_SIZE]
+        delivered = {
+            vacancy_id for vacancy_id, in db.query(Delivery.vacancy_id)
+            .filter(Delivery.user_id == user_id, Delivery.vacancy_id.in_(batch))
+        }
+        new_ids.update(vacancy_id for vacancy_id in batch if vacancy_id not in delivered)
+
+    if new_ids:
+        now = datetime.utcnow()
+        rows = [{"user_id": user_id, "vacancy_id": vacancy_id, "delivered_at": now} for vacancy_id in new_ids]
+        for start in range(0, len(rows), VACANCY_BATCH_SIZE):
+            stmt = upsert_statement(db, Delivery.__table__).values(rows[start:start + VACANCY_BATCH_SIZE])
+            db.execute(stmt.on_conflict_do_nothing())
+        db.commit()
+    return new_ids
+
+def select_new_vacancies(
+    db: Session,
+    user_id: int,
+    vacancies: List[Dict],
+    vacancy_ids: Optional[List[int]] = None
+) -> List[Dict]:
+    if not vacancies:
+        return []
+    if vacancy_ids is None:
+        vacancy_ids = upsert_vacancies(db, vacancies)
+    new_ids = claim_deliveries(db, user_id, vacancy_ids)
+
+    # Tagged with their ids, so a failed send can give the claim back with release_deliveries
+    fresh = []
+    for vacancy_id, vacancy in zip(vacancy_ids, vacancies):
+        if vacancy_id in new_ids:
+            new_ids.discard(vacancy_id)
+            fresh.append({**vacancy, "vacancy_id": vacancy_id})
+    return fresh
+
+# Undoes claim_deliveries for vacancies whose message never reached the user
+def release_deliveries(db: Session, user_id: int, vacancy_ids: List[int]):
+    unique = list(dict.fromkeys(vacancy_ids))
+    for start in range(0, len(unique), VACANCY_BATCH_SIZE):
+        db.query(Delivery).filter(
+            Delivery.user_id == user_id, Delivery.vacancy_id.in_(unique[start:start + VACANCY_BATCH_SIZE])
+        ).delete(synchronize_session=False)
+    db.commit()
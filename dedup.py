@@ -0,0 +1,113 @@
+import random
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from config import DEDUP_THRESHOLD
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Legal-form noise that differs between boards for the same employer
+COMPANY_SUFFIXES = {
+    "llc", "ltd", "inc", "corp", "co", "company", "gmbh", "plc", "group",
+    "ооо", "оао", "зао", "пао", "ао", "ип",
+}
+
+UNKNOWN = "not specified"
+
+# MinHash signature split into LSH bands; two postings become candidates
+# when any band matches, then their title token sets are compared exactly
+NUM_PERMUTATIONS = 16
+BAND_ROWS = 2
+MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def normalize_text(text: Optional[str]) -> List[str]:
+    if not text or text.strip().casefold() == UNKNOWN:
+        return []
+    return TOKEN_RE.findall(text.casefold().replace("ё", "е"))
+
+def company_key(company: Optional[str]) -> str:
+    return " ".join(token for token in normalize_text(company) if token not in COMPANY_SUFFIXES)
+
+def title_tokens(title: Optional[str]) -> FrozenSet[str]:
+    return frozenset(normalize_text(title))
+
+def minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [hash(token) & 0xFFFFFFFFFFFFFFFF for token in tokens]
+    return tuple(
+        min((a * h + b) % MERSENNE_PRIME for h in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+def jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    return len(left & right) / len(left | right)
+
+# Higher is better: a known salary outweighs everything else
+def richness(vacancy: Dict) -> int:
+    score = 0
+    if vacancy.get("salary") and vacancy["salary"] != "Not specified":
+        score += 4
+    if vacancy.get("external_id"):
+        score += 1
+    for field in ("title", "company"):
+        if normalize_text(vacancy.get(field)):
+            score += 1
+    return score
+
+
+class Deduplicator:
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._records: List[Tuple[FrozenSet[str], Dict]] = []
+        self._buckets: Dict[tuple, List[int]] = {}
+
+    def _band_keys(self, company: str, signature: Tuple[int, ...]):
+        for band in range(0, NUM_PERMUTATIONS, BAND_ROWS):
+            yield company, band, signature[band:band + BAND_ROWS]
+
+    # Only the same job on different boards is a duplicate: two postings on one board
+    # are two jobs, even with the same title, unless they are the same listing
+    def _same_job(self, vacancy: Dict, tokens: FrozenSet[str], index: int) -> bool:
+        other_tokens, other = self._records[index]
+        if vacancy.get("source") == other.get("source"):
+            return bool(vacancy.get("external_id")) and vacancy.get("external_id") == other.get("external_id")
+        return jaccard(tokens, other_tokens) >= self.threshold
+
+    def _find(self, vacancy: Dict, tokens: FrozenSet[str], keys: List[tuple]) -> Optional[int]:
+        for key in keys:
+            for index in self._buckets.get(key, ()):
+                if self._same_job(vacancy, tokens, index):
+                    return index
+        return None
+
+    # Returns the postings of this batch that don't duplicate anything seen so far.
+    # Within a batch the richer posting wins; postings from earlier batches are kept as is.
+    def add(self, vacancies: List[Dict]) -> List[Dict]:
+        batch_start = len(self._records)
+
+        for vacancy in vacancies:
+            tokens = title_tokens(vacancy.get("title"))
+            company = company_key(vacancy.get("company"))
+            if not tokens or not company:
+                self._records.append((tokens, vacancy))
+                continue
+
+            keys = list(self._band_keys(company, minhash(tokens)))
+            duplicate = self._find(vacancy, tokens, keys)
+            if duplicate is None:
+                index = len(self._records)
+                self._records.append((tokens, vacancy))
+                for key in keys:
+                    self._buckets.setdefault(key, []).append(index)
+            elif duplicate >= batch_start and richness(vacancy) > richness(self._records[duplicate][1]):
+                self._records[duplicate] = (self._records[duplicate][0], vacancy)
+
+        return [vacancy for _, vacancy in self._records[batch_start:]]
+
+
+def deduplicate(vacancies: List[Dict], threshold: float = DEDUP_THRESHOLD) -> List[Dict]:
+    return Deduplicator(threshold).add(vacancies)
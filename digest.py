@@ -0,0 +1,96 @@
+import html
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+from config import DIGEST_MESSAGE_LIMIT, DIGEST_PAGE_SIZE, DIGEST_FIELD_LIMIT, DIGEST_TTL, DIGEST_MAX_SNAPSHOTS
+
+DIGEST_CALLBACK_PREFIX = "digest"
+ENTRY_SEPARATOR = "\n\n"
+
+
+# Escaped for HTML messages; long text is cut before escaping, so no entity or tag is ever split
+def escape_field(value, limit: int = DIGEST_FIELD_LIMIT) -> str:
+    text = str(value)
+    if len(text) > limit:
+        text = text[:limit - 1] + "…"
+    return html.escape(text)
+
+# Packs entries into pages that fit one Telegram message. Pages break only between entries:
+# entries are kept short by escape_field, so one is never cut through its markup
+def paginate(entries: List[str], limit: int = DIGEST_MESSAGE_LIMIT, page_size: int = DIGEST_PAGE_SIZE) -> List[List[str]]:
+    pages = []
+    page, length = [], 0
+    for entry in entries:
+        if page and (length + len(ENTRY_SEPARATOR) + len(entry) > limit or len(page) >= page_size):
+            pages.append(page)
+            page, length = [], 0
+        length += len(entry) + (len(ENTRY_SEPARATOR) if page else 0)
+        page.append(entry)
+    if page:
+        pages.append(page)
+    return pages
+
+
+class Digest:
+    def __init__(self, digest_id: str, user_id: int, title: str):
+        self.id = digest_id
+        self.user_id = user_id
+        self.title = title
+        self.entries: List[str] = []
+        self.pages: List[List[str]] = []
+        self.page = 0
+        # Future of the sent digest message, filled in on first send
+        self.message = None
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()
+
+    def extend(self, entries: List[str]):
+        with self.lock:
+            self.entries.extend(entries)
+            header = len(self.title) + len(ENTRY_SEPARATOR)
+            self.pages = paginate(self.entries, limit=DIGEST_MESSAGE_LIMIT - header)
+
+    def render(self, page: Optional[int] = None) -> str:
+        with self.lock:
+            if page is not None:
+                self.page = max(0, min(page, len(self.pages) - 1))
+            body = ENTRY_SEPARATOR.join(self.pages[self.page]) if self.pages else ""
+            return self.title + ENTRY_SEPARATOR + body
+
+
+class DigestStore:
+    def __init__(self, ttl: float = DIGEST_TTL, max_snapshots: int = DIGEST_MAX_SNAPSHOTS):
+        self.ttl = ttl
+        self.max_snapshots = max_snapshots
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, user_id: int, title: str) -> Digest:
+        digest = Digest(secrets.token_hex(6), user_id, title)
+        with self._lock:
+            self._digests[digest.id] = digest
+            while len(self._digests) > self.max_snapshots:
+                self._digests.popitem(last=False)
+        return digest
+
+    def get(self, digest_id: str) -> Optional[Digest]:
+        with self._lock:
+            digest = self._digests.get(digest_id)
+            if digest is None:
+                return None
+            if time.monotonic() - digest.touched > self.ttl:
+                del self._digests[digest_id]
+                return None
+            digest.touched = time.monotonic()
+            self._digests.move_to_end(digest_id)
+            return digest
+
+
+def page_callback(digest: Digest, page: int) -> str:
+    return f"{DIGEST_CALLBACK_PREFIX}:{digest.id}:{page}"
+
+def parse_page_callback(data: str):
+    _, digest_id, page = data.split(":")
+    return digest_id, int(page)
@@ -0,0 +1,204 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from config import METRICS_HOST, METRICS_PORT, METRICS_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Sorted (label, value) pairs identify one series of a metric
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(label_key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{format_labels(key)} {format_value(value)}" for key, value in self._values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = METRICS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per series: bucket counts (non-cumulative), sum, count
+        self._series: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{format_labels(key, ('le', format_value(bound)))} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(key)} {format_value(total)}")
+                lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+
+# Read at scrape time from a callback returning {labels: value}, e.g. queue depths
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], Dict[LabelKey, float]]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.read()
+        except Exception as e:
+            logger.error(f"Error reading gauge {self.name}: {e}")
+            return []
+        return [f"{self.name}{format_labels(key)} {format_value(value)}" for key, value in values.items()]
+
+
+REGISTRY: List = []
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = register(Histogram("jobbot_stage_seconds", "Time spent in each pipeline stage"))
+STAGE_ERRORS = register(Counter("jobbot_stage_errors_total", "Pipeline stages that raised"))
+EVENTS = register(Counter("jobbot_events_total", "Pipeline events such as cache hits and misses"))
+
+
+# Times a block as one stage: span("hh_request"), span("source", source="LinkedIn")
+@contextmanager
+def span(stage: str, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage, **labels)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage, **labels)
+
+def observe(stage: str, seconds: float, **labels):
+    STAGE_SECONDS.observe(seconds, stage=stage, **labels)
+
+def event(name: str, **labels):
+    EVENTS.inc(event=name, **labels)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> Optional[ThreadingHTTPServer]:
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logger.error(f"Metrics endpoint not started on {host}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+# Handlers only enqueue records; a background thread does the file writes.
+# Handlers the caller already configured are kept, just moved behind the queue
+def setup_logging(filename: str = "log.log", level: int = logging.INFO):
+    global _log_listener
+    if _log_listener is not None:
+        return
+
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    if not handlers:
+        handler = logging.FileHandler(filename, mode='a', encoding='utf-8')
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers = [handler]
+        root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+
+    records = queue.SimpleQueue()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    _log_listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _log_listener.start()
+    # Flush what is still queued on exit
+    atexit.register(_log_listener.stop)
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, JSON
+from datetime import datetime
+from sqlalchemy import Column, BigInteger, Integer, String, Text, JSON, ForeignKey, DateTime, DDL, event
 from config import Base
 
 class UserSettings(Base):
     __tablename__ = "user_settings"
 
-    user_id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
     keywords = Column(JSON, nullable=False)
     locations = Column(JSON, nullable=False)
     salary_min = Column(Integer, nullable=False)
@@ -17,3 +18,80 @@ class UserSettings(Base):
         "salary_min": self.salary_min,
         "experience": self.experience
         }
+
+class Subscription(Base):
+    __tablename__ = "subscriptions"
+
+    user_id = Column(BigInteger, ForeignKey("user_settings.user_id"), primary_key=True)
+    interval_minutes = Column(Integer, nullable=False)
+
+class Vacancy(Base):
+    __tablename__ = "vacancies"
+
+    id = Column(Integer, primary_key=True)
+    # sha1 of the source's external ID, or of the canonical URL when there is none
+    fingerprint = Column(String(40), nullable=False, unique=True, index=True)
+    source = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    company = Column(String, nullable=False)
+    salary = Column(String)
+    url = Column(String, nullable=False)
+    first_seen_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_seen_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+        "title": self.title,
+        "company": self.company,
+        "salary": self.salary,
+        "url": self.url,
+        "source": self.source
+        }
+
+# Searchable fields of a vacancy, kept out of the hot vacancies table
+class VacancyDocument(Base):
+    __tablename__ = "vacancy_documents"
+
+    vacancy_id = Column(Integer, ForeignKey("vacancies.id"), primary_key=True)
+    description = Column(Text, nullable=False, default="")
+    salary_from = Column(Integer, index=True)
+    salary_to = Column(Integer, index=True)
+    salary_currency = Column(String)
+    # Top of the range in rubles, which is what the salary filter compares
+    salary_rub = Column(Integer, index=True)
+    experience = Column(String, index=True)
+    # Lowercased location text as the board shows it; area_id is HH's area
+    area = Column(String, index=True)
+    area_id = Column(Integer, index=True)
+    posted_at = Column(DateTime, index=True)
+
+# SQLite only: full-text index over title, company and description, rowid = vacancies.id
+event.listen(
+    VacancyDocument.__table__,
+    "after_create",
+    DDL(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS vacancy_fts USING fts5("
+        "title, company, description, tokenize = 'unicode61 remove_diacritics 2')"
+    ).execute_if(dialect="sqlite")
+)
+
+# When a source last ran a normalized query upstream
+class IndexedQuery(Base):
+    __tablename__ = "indexed_queries"
+
+    source = Column(String, primary_key=True)
+    query_key = Column(String, primary_key=True)
+    refreshed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class Delivery(Base):
+    __tablename__ = "deliveries"
+
+    user_id = Column(BigInteger, primary_key=True)
+    vacancy_id = Column(Integer, ForeignKey("vacancies.id"), primary_key=True)
+    delivered_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class ConversationState(Base):
+    __tablename__ = "conversation_states"
+
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    state = Column(Integer, nullable=False)
@@ -0,0 +1,190 @@
+import atexit
+import logging
+import pickle
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Dict, List, Optional
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from config import LINKEDIN_POOL_SIZE, LINKEDIN_DRIVER_MAX_USES, LINKEDIN_COOKIES_PATH
+from metrics import span
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+CHROME_ARGUMENTS = [
+    "--headless",
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-blink-features=AutomationControlled",
+    f"user-agent={USER_AGENT}",
+    "--disable-gpu",
+    "--window-size=1920,1080",
+    "--disable-infobars",
+    "--disable-extensions",
+    "--disable-popup-blocking",
+    "--ignore-certificate-errors",
+    "--disable-web-security",
+    "--disable-notifications",
+    "--disable-save-password-bubble",
+    "--disable-single-click-autofill",
+    "--disable-autofill-keyboard-accessory-view[8]",
+    "--disable-translate",
+]
+
+STEALTH_SCRIPT = """
+Object.defineProperty(navigator, 'webdriver', {
+get: () => undefined
+});
+Object.defineProperty(navigator, 'plugins', {
+get: () => [1, 2, 3]
+});
+"""
+
+# Name of the LinkedIn session cookie, used to validate the jar without a page load
+SESSION_COOKIE = "li_at"
+
+
+@lru_cache(maxsize=1)
+def get_driver_path() -> str:
+    # Resolved once per process instead of on every search
+    return ChromeDriverManager().install()
+
+
+def create_driver():
+    options = Options()
+    for argument in CHROME_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option("useAutomationExtension", False)
+
+    with span("chrome_start"):
+        driver = webdriver.Chrome(service=Service(get_driver_path()), options=options)
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": STEALTH_SCRIPT})
+    return driver
+
+
+class CookieJar:
+    def __init__(self, path: str):
+        self.path = path
+        self._cookies: Optional[List[Dict]] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> List[Dict]:
+        with self._lock:
+            if self._cookies is None:
+                try:
+                    with open(self.path, 'rb') as cookiesfile:
+                        self._cookies = pickle.load(cookiesfile)
+                except (OSError, pickle.PickleError, EOFError):
+                    self._cookies = []
+            return list(self._cookies)
+
+    def save(self, cookies: List[Dict]):
+        with self._lock:
+            self._cookies = list(cookies)
+            try:
+                with open(self.path, 'wb') as filehandler:
+                    pickle.dump(self._cookies, filehandler)
+            except OSError as e:
+                logger.warning(f"Could not persist LinkedIn cookies: {e}")
+
+    def invalidate(self):
+        with self._lock:
+            self._cookies = []
+
+    def is_valid(self) -> bool:
+        now = time.time()
+        for cookie in self.get():
+            if cookie.get("name") == SESSION_COOKIE:
+                expiry = cookie.get("expiry")
+                return expiry is None or expiry > now
+        return False
+
+
+class PooledDriver:
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.logged_in = False
+        self.broken = False
+
+
+class DriverPool:
+    def __init__(self, size: int, max_uses: int):
+        self.size = size
+        self.max_uses = max_uses
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No LinkedIn driver available")
+
+        pooled = None
+        try:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                pooled = PooledDriver(create_driver())
+
+            pooled.uses += 1
+            yield pooled
+        except Exception:
+            if pooled is not None:
+                pooled.broken = True
+            raise
+        finally:
+            if pooled is not None:
+                self._checkin(pooled)
+            self._slots.release()
+
+    def _checkin(self, pooled: PooledDriver):
+        if self._closed or pooled.broken or pooled.uses >= self.max_uses or not self._healthy(pooled):
+            self._discard(pooled)
+            return
+        self._idle.put(pooled)
+
+    def _healthy(self, pooled: PooledDriver) -> bool:
+        try:
+            return bool(pooled.driver.window_handles)
+        except Exception as e:
+            logger.warning(f"LinkedIn driver failed health check: {e}")
+            return False
+
+    def _discard(self, pooled: PooledDriver):
+        logger.info(f"Recycling LinkedIn driver after {pooled.uses} uses")
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning(f"Driver quit failed: {e}")
+
+    def warm(self, count: Optional[int] = None):
+        for _ in range(min(count or self.size, self.size) - self._idle.qsize()):
+            try:
+                self._idle.put(PooledDriver(create_driver()))
+            except Exception as e:
+                logger.error(f"Failed to warm LinkedIn driver: {e}")
+                return
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+cookie_jar = CookieJar(LINKEDIN_COOKIES_PATH)
+driver_pool = DriverPool(LINKEDIN_POOL_SIZE, LINKEDIN_DRIVER_MAX_USES)
+atexit.register(driver_pool.close)
+
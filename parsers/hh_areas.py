@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import requests
+from config import HH_AREAS_URL, HH_AREAS_CACHE_PATH, HH_AREAS_SNAPSHOT_PATH, HH_AREAS_TTL, HH_AREAS_RETRY
+from config import HH_AREA_SUGGESTIONS, HH_REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Cyrillic names are keyed by a Latin spelling, so "Казань" and "Kazan" are the same key
+TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e", "ж": "zh", "з": "z", "и": "i",
+    "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t",
+    "у": "u", "ф": "f", "х": "h", "ц": "c", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "y", "ь": "",
+    "э": "e", "ю": "yu", "я": "ya", "і": "i", "ї": "i", "є": "e", "ґ": "g", "ә": "a", "ғ": "g", "қ": "k",
+    "ң": "n", "ө": "o", "ұ": "u", "ү": "u", "һ": "h"
+})
+
+# Common ways of writing the same sound in Latin, reduced to one spelling
+LATIN_VARIANTS = [(re.compile(pattern), replacement) for pattern, replacement in (
+    (r"shch|sch", "sh"),
+    (r"kh", "h"),
+    (r"ts|tz", "c"),
+    (r"x", "ks"),
+    (r"w", "v"),
+    (r"q", "k"),
+    (r"j", "y"),
+    (r"(?:iy|yy|ii|yi)\b", "y"),
+    (r"\bye", "e"),
+    (r"(.)\1", r"\1"),
+)]
+
+# Names HH doesn't use; "remote" keeps meaning all of Russia, as before the areas tree
+ALIASES = {
+    "remote": 113,
+    "russia": 113,
+    "moscow": 1,
+    "msk": 1,
+    "saint petersburg": 2,
+    "st petersburg": 2,
+    "spb": 2,
+    "питер": 2,
+    "rostov on don": 76,
+    "kyiv": 115,
+    "ukraine": 5
+}
+
+NAME_PREFIXES = ("республика ",)
+
+
+def area_key(text: str) -> str:
+    key = re.sub(r"[\W_]+", " ", text.casefold()).strip().translate(TRANSLIT)
+    for pattern, replacement in LATIN_VARIANTS:
+        key = pattern.sub(replacement, key)
+    return key
+
+
+class AreaIndex:
+    def __init__(self, tree: List[Dict]):
+        self.names: Dict[int, str] = {}
+        self.parents: Dict[int, Optional[int]] = {}
+        self.children: Dict[int, List[int]] = {}
+        self.depths: Dict[int, int] = {}
+        keys: Dict[str, List[int]] = {}
+
+        stack = [(node, 0) for node in reversed(tree)]
+        while stack:
+            node, depth = stack.pop()
+            area_id = int(node["id"])
+            parent_id = int(node["parent_id"]) if node.get("parent_id") else None
+            self.names[area_id] = node["name"]
+            self.parents[area_id] = parent_id
+            self.depths[area_id] = depth
+            self.children.setdefault(area_id, [])
+            if parent_id is not None:
+                self.children.setdefault(parent_id, []).append(area_id)
+
+            name = node["name"].casefold()
+            variants = [name] + [name[len(prefix):] for prefix in NAME_PREFIXES if name.startswith(prefix)]
+            for variant in variants:
+                keys.setdefault(area_key(variant), []).append(area_id)
+            stack.extend((child, depth + 1) for child in reversed(node.get("areas") or []))
+
+        for alias, area_id in ALIASES.items():
+            if area_id in self.names:
+                keys.setdefault(area_key(alias), []).insert(0, area_id)
+
+        # Places sharing a name: the one closest to the root wins
+        self.keys = {
+            key: sorted(dict.fromkeys(ids), key=lambda area_id: (self.depths[area_id], area_id))
+            for key, ids in keys.items()
+        }
+        self.sorted_keys = sorted(self.keys)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def resolve(self, location: str) -> Optional[int]:
+        ids = self.keys.get(area_key(location))
+        return ids[0] if ids else None
+
+    # Area names whose key starts with the typed text, shortest first
+    def suggest(self, prefix: str, limit: int = HH_AREA_SUGGESTIONS) -> List[str]:
+        prefix = area_key(prefix)
+        if not prefix:
+            return []
+        found = []
+        for position in range(bisect_left(self.sorted_keys, prefix), len(self.sorted_keys)):
+            key = self.sorted_keys[position]
+            if not key.startswith(prefix):
+                break
+            found.extend((len(key), self.depths[area_id], area_id) for area_id in self.keys[key])
+        names = dict.fromkeys(self.names[area_id] for _, _, area_id in sorted(found))
+        return list(names)[:limit]
+
+    # The area and every area containing it
+    def ancestors(self, area_id: int) -> Set[int]:
+        found = set()
+        while area_id is not None and area_id not in found:
+            found.add(area_id)
+            area_id = self.parents.get(area_id)
+        return found
+
+    # The areas and everything inside them
+    def descendants(self, area_ids: Iterable[int]) -> List[int]:
+        found = []
+        stack = list(area_ids)
+        seen = set()
+        while stack:
+            area_id = stack.pop()
+            if area_id in seen:
+                continue
+            seen.add(area_id)
+            found.append(area_id)
+            stack.extend(self.children.get(area_id, ()))
+        return found
+
+
+def read_tree(path: str) -> Optional[List[Dict]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read HH areas from {path}: {e}")
+        return None
+
+def download_tree(path: str = HH_AREAS_CACHE_PATH) -> List[Dict]:
+    response = requests.get(HH_AREAS_URL, timeout=HH_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    tree = response.json()
+    # Written next to the target and renamed, so readers never see half a file
+    partial = f"{path}.tmp"
+    with open(partial, "w", encoding="utf-8") as f:
+        json.dump(tree, f, ensure_ascii=False)
+    os.replace(partial, path)
+    return tree
+
+
+_index: Optional[AreaIndex] = None
+_loaded_at = 0.0
+_refreshing = False
+_lock = threading.Lock()
+
+def cache_age() -> Optional[float]:
+    try:
+        return time.time() - os.path.getmtime(HH_AREAS_CACHE_PATH)
+    except OSError:
+        return None
+
+def refresh():
+    global _index, _loaded_at, _refreshing
+    try:
+        tree = download_tree()
+        index = AreaIndex(tree)
+        with _lock:
+            _index, _loaded_at = index, time.time()
+        logger.info(f"Loaded {len(index)} HH areas from {HH_AREAS_URL}")
+    except Exception as e:
+        logger.warning(f"HH areas refresh failed, keeping the current tree: {e}")
+        with _lock:
+            # Try again after HH_AREAS_RETRY rather than on every lookup
+            _loaded_at = time.time() - HH_AREAS_TTL + HH_AREAS_RETRY
+    finally:
+        with _lock:
+            _refreshing = False
+
+# The disk cache when there is one, else the bundled snapshot; returns the index and when its tree was fetched
+def load_index() -> Tuple[AreaIndex, float]:
+    age = cache_age()
+    tree = read_tree(HH_AREAS_CACHE_PATH) if age is not None else None
+    if tree is None:
+        return AreaIndex(read_tree(HH_AREAS_SNAPSHOT_PATH) or []), 0.0
+    return AreaIndex(tree), time.time() - age
+
+# Never waits on the network: a stale or missing cache is refreshed in the background
+def area_index() -> AreaIndex:
+    global _index, _loaded_at, _refreshing
+    with _lock:
+        if _index is None:
+            _index, _loaded_at = load_index()
+        if time.time() - _loaded_at > HH_AREAS_TTL and not _refreshing:
+            _refreshing = True
+            threading.Thread(target=refresh, name="hh-areas", daemon=True).start()
+        return _index
+
+
+# python -m parsers.hh_areas: refreshes the bundled snapshot from the API
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"{len(AreaIndex(download_tree(HH_AREAS_SNAPSHOT_PATH)))} areas written to {HH_AREAS_SNAPSHOT_PATH}")
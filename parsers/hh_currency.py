@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional
+import requests
+from config import HH_DICTIONARIES_URL, HH_CURRENCY_TTL, HH_CURRENCY_RETRY, HH_CURRENCY_RATES, HH_REQUEST_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# HH's code for rubles; salaries without a currency are taken as rubles too
+RUBLES = "RUR"
+
+
+def download_rates() -> Dict[str, float]:
+    response = requests.get(HH_DICTIONARIES_URL, timeout=HH_REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return {currency["code"]: float(currency["rate"]) for currency in response.json()["currency"] if currency.get("rate")}
+
+
+_rates: Dict[str, float] = dict(HH_CURRENCY_RATES)
+_loaded_at = 0.0
+_refreshing = False
+_lock = threading.Lock()
+
+def refresh():
+    global _rates, _loaded_at, _refreshing
+    try:
+        rates = download_rates()
+        with _lock:
+            _rates, _loaded_at = rates, time.time()
+        logger.info(f"Loaded {len(rates)} HH exchange rates from {HH_DICTIONARIES_URL}")
+    except Exception as e:
+        logger.warning(f"HH exchange rates refresh failed, keeping the current rates: {e}")
+        with _lock:
+            _loaded_at = time.time() - HH_CURRENCY_TTL + HH_CURRENCY_RETRY
+    finally:
+        with _lock:
+            _refreshing = False
+
+# Never waits on the network: stale rates are refreshed in the background
+def exchange_rates() -> Dict[str, float]:
+    global _refreshing
+    with _lock:
+        if time.time() - _loaded_at > HH_CURRENCY_TTL and not _refreshing:
+            _refreshing = True
+            threading.Thread(target=refresh, name="hh-currency", daemon=True).start()
+        return _rates
+
+def to_rubles(amount: Optional[float], currency: Optional[str]) -> Optional[int]:
+    if not amount:
+        return None
+    rate = exchange_rates().get(currency or RUBLES)
+    return round(amount / rate) if rate else None
+
+# Top of the vacancy's salary range in rubles; None when it states no salary or an unknown currency
+def salary_rubles(vacancy: Dict) -> Optional[int]:
+    top = max(vacancy.get("salary_from") or 0, vacancy.get("salary_to") or 0)
+    return to_rubles(top, vacancy.get("salary_currency"))
@@ -1,57 +1,184 @@
+import asyncio
+import json
+import re
+import aiohttp
 import requests
 import logging
-from typing import List, Dict
-from database import get_user_settings
-from config import SessionLocal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional
+from requests.adapters import HTTPAdapter
+from cache import cached_search, cached_search_async
+from config import HH_API_URL, HH_PER_PAGE, HH_MAX_PAGES, HH_PAGE_WORKERS, HH_REQUEST_TIMEOUT
+from config import HH_HTTP_CACHE_PATH, HH_HTTP_CACHE_MAX_BYTES
+from metrics import span
+from parsers.hh_areas import area_index
+from parsers.http_cache import HTTPCache, flatten_params, cache_key
 
 logger = logging.getLogger(__name__)
 
-def parse_hh(user_id: int) -> List[Dict]:
-    db = SessionLocal()
-    try:
-        settings = get_user_settings(db, user_id)
-        if not settings:
-            return []
+# HH never returns more than this many items for a single query
+HH_RESULT_LIMIT = 2000
+
+# Search term highlighting in snippets, e.g. <highlighttext>Python</highlighttext>
+HIGHLIGHT_TAG = re.compile(r"</?highlighttext>")
+
+# Shared keep-alive session so searches reuse TLS connections
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=HH_PAGE_WORKERS))
+page_executor = ThreadPoolExecutor(max_workers=HH_PAGE_WORKERS, thread_name_prefix="hh-page")
+
+# Conditional-request cache: fresh pages skip the network, stale ones are revalidated with ETag/Last-Modified
+http_cache = HTTPCache(HH_HTTP_CACHE_PATH, HH_HTTP_CACHE_MAX_BYTES)
+
+# aiohttp counterpart for the asyncio runtime, created on first use inside the event loop
+async_session: Optional[aiohttp.ClientSession] = None
+
+def parse_hh(settings) -> List[Dict]:
+    if not settings:
+        return []
 
-        params = {
-        "text": " AND ".join(settings.keywords),
-        "search_field": "name",
-        "area": get_area_ids(settings.locations),
-        "salary": settings.salary_min,
-        "experience": settings.experience,
-        "per_page": 20,
-        "page": 0
-        }
+    return cached_search("HeadHunter", search_hh, settings)
 
-        response = requests.get("https://api.hh.ru/vacancies", params=params)
-        response.raise_for_status()
+def build_params(settings) -> Dict:
+    return {
+    "text": " AND ".join(settings.keywords),
+    "search_field": "name",
+    "area": get_area_ids(settings.locations),
+    "salary": settings.salary_min,
+    "experience": settings.experience,
+    "per_page": HH_PER_PAGE
+    }
 
-        return [format_vacancy(item) for item in response.json().get('items', [])]
+def fetch_page(params: Dict, page: int) -> Dict:
+    with span("hh_request"):
+        body = http_cache.get(session, HH_API_URL, {**params, "page": page}, HH_REQUEST_TIMEOUT)
+    return json.loads(body)
+
+# First page, then the rest concurrently. Results come back as one list rather than page by page:
+# the result cache, single-flight and dedup all need the whole result, and /search shows saved jobs
+# while this runs. A failed page fails the search, so a partial list is never cached or marked fresh
+def search_hh(query, max_pages: int = HH_MAX_PAGES) -> List[Dict]:
+    params = build_params(query)
+    if query.locations and not params["area"]:
+        logger.info(f"No HH area for {list(query.locations)}, skipping HH")
+        return []
 
+    first = fetch_page(params, 0)
+    vacancies = [format_vacancy(item) for item in first.get('items', [])]
+
+    pages = min(first.get('pages', 1), max_pages, HH_RESULT_LIMIT // HH_PER_PAGE)
+    futures = [page_executor.submit(fetch_page, params, page) for page in range(1, pages)]
+    try:
+        for future in as_completed(futures):
+            data = future.result()
+            vacancies.extend(format_vacancy(item) for item in data.get('items', []))
     except Exception as e:
-        logger.error(f"HH parsing error: {e}")
+        logger.error(f"HH page fetch error: {e}")
+        for future in futures:
+            future.cancel()
+        raise
+    return vacancies
+
+async def parse_hh_async(settings) -> List[Dict]:
+    if not settings:
         return []
-    finally:
-        db.close()
 
+    return await cached_search_async("HeadHunter", search_hh_async, settings)
+
+def get_async_session() -> aiohttp.ClientSession:
+    global async_session
+    if async_session is None or async_session.closed:
+        async_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=HH_PAGE_WORKERS * 4),
+            timeout=aiohttp.ClientTimeout(total=HH_REQUEST_TIMEOUT)
+        )
+    return async_session
+
+async def fetch_page_async(params: Dict, page: int) -> Dict:
+    query = flatten_params({**params, "page": page})
+    key = cache_key(HH_API_URL, query)
+    entry = http_cache.lookup(key)
+    if http_cache.is_fresh(entry):
+        http_cache.count("hits")
+        return json.loads(entry.body)
+
+    headers = http_cache.conditional_headers(entry)
+    with span("hh_request"):
+        async with get_async_session().get(HH_API_URL, params=query, headers=headers) as response:
+            if response.status == 304 and entry is not None:
+                http_cache.count("revalidated")
+                http_cache.refresh(key, response.headers)
+                return json.loads(entry.body)
+
+            response.raise_for_status()
+            body = await response.read()
+    http_cache.count("misses")
+    http_cache.store(key, response.headers, body)
+    return json.loads(body)
+
+async def search_hh_async(query) -> List[Dict]:
+    params = build_params(query)
+    if query.locations and not params["area"]:
+        logger.info(f"No HH area for {list(query.locations)}, skipping HH")
+        return []
+
+    first = await fetch_page_async(params, 0)
+    vacancies = [format_vacancy(item) for item in first.get('items', [])]
+
+    pages = min(first.get('pages', 1), HH_MAX_PAGES, HH_RESULT_LIMIT // HH_PER_PAGE)
+    results = await asyncio.gather(
+        *(fetch_page_async(params, page) for page in range(1, pages)),
+        return_exceptions=True
+    )
+    for data in results:
+        if isinstance(data, Exception):
+            logger.error(f"HH page fetch error: {data}")
+            raise data
+        vacancies.extend(format_vacancy(item) for item in data.get('items', []))
+    return vacancies
+
+def resolve_area(location: str) -> Optional[int]:
+    return area_index().resolve(location)
+
+# HH areas of the locations HH knows; the others are left to the other boards
 def get_area_ids(locations: List[str]) -> List[int]:
-    area_map = {
-    "Moscow": 1,
-    "Saint Petersburg": 2,
-    "Remote": 113,
-    "New York": 124,
-    }
-    return [area_map.get(loc, 113) for loc in locations]
+    return list(dict.fromkeys(
+        area_id for area_id in (resolve_area(location) for location in locations) if area_id is not None
+    ))
 
 def format_vacancy(item: Dict) -> Dict:
+    salary = item.get('salary') or {}
+    area = item.get('area') or {}
     return {
+    "external_id": item.get('id'),
     "title": item.get('name'),
     "company": item.get('employer', {}).get('name'),
     "salary": format_salary(item.get('salary')),
     "url": item.get('alternate_url'),
-    "source": "HeadHunter"
+    "source": "HeadHunter",
+    # Not shown to users; stored for the local vacancy index
+    "description": format_snippet(item.get('snippet')),
+    "salary_from": salary.get('from'),
+    "salary_to": salary.get('to'),
+    "salary_currency": salary.get('currency'),
+    "experience": (item.get('experience') or {}).get('id'),
+    "location": format_location(area, item.get('schedule')),
+    "area_id": int(area['id']) if str(area.get('id', '')).isdigit() else None,
+    "posted_at": item.get('published_at')
     }
 
+def format_snippet(snippet: Optional[Dict]) -> str:
+    if not snippet:
+        return ""
+    parts = [snippet.get('requirement'), snippet.get('responsibility')]
+    return HIGHLIGHT_TAG.sub("", " ".join(part for part in parts if part))
+
+def format_location(area: Dict, schedule: Optional[Dict]) -> Optional[str]:
+    location = area.get('name')
+    if (schedule or {}).get('id') == "remote":
+        location = f"{location} (remote)" if location else "Remote"
+    return location
+
 def format_salary(salary: Dict) -> str:
     if not salary:
         return "Not specified"
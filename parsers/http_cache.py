@@ -0,0 +1,169 @@
+import email.utils
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+from metrics import event
+
+logger = logging.getLogger(__name__)
+
+CacheEntry = namedtuple("CacheEntry", ["body", "etag", "last_modified", "expires_at"])
+
+
+def flatten_params(params: Dict) -> List[Tuple[str, str]]:
+    return sorted(
+        (key, str(value))
+        for key, values in params.items()
+        for value in (values if isinstance(values, (list, tuple)) else [values])
+    )
+
+def cache_key(url: str, params: List[Tuple[str, str]]) -> str:
+    return f"{url}?{urlencode(params)}"
+
+def parse_cache_control(value: str) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in value.split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"') or None
+    return directives
+
+# Returns the expiry timestamp, or None when the response must not be stored
+def freshness(headers: Mapping[str, str], now: float) -> Optional[float]:
+    directives = parse_cache_control(headers.get("Cache-Control", ""))
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return now
+    for name in ("s-maxage", "max-age"):
+        value = directives.get(name)
+        if value and value.isdigit():
+            return now + int(value)
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return email.utils.parsedate_to_datetime(expires).timestamp()
+        except (TypeError, ValueError):
+            return now
+    # No explicit lifetime: keep it, but revalidate before every use
+    return now
+
+
+class HTTPCache:
+    def __init__(self, path: str, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS http_cache ("
+            "key TEXT PRIMARY KEY, body BLOB NOT NULL, etag TEXT, last_modified TEXT, "
+            "expires_at REAL NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS http_cache_last_used ON http_cache (last_used)")
+        self._db.commit()
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, expires_at FROM http_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE http_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return CacheEntry(*row)
+
+    def is_fresh(self, entry: Optional[CacheEntry]) -> bool:
+        return entry is not None and entry.expires_at > time.time()
+
+    def conditional_headers(self, entry: Optional[CacheEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, key: str, headers: Mapping[str, str], body: bytes):
+        now = time.time()
+        expires_at = freshness(headers, now)
+        etag, last_modified = headers.get("ETag"), headers.get("Last-Modified")
+        if expires_at is None or (expires_at <= now and not etag and not last_modified):
+            # Nothing to reuse: not fresh and no validator to revalidate with
+            return
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO http_cache "
+                "(key, body, etag, last_modified, expires_at, size, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, body, etag, last_modified, expires_at, len(body), now)
+            )
+            self._evict()
+            self._db.commit()
+        self.count("stored")
+
+    # A 304 confirms the stored body; only its lifetime and validators change
+    def refresh(self, key: str, headers: Mapping[str, str]):
+        now = time.time()
+        expires_at = freshness(headers, now) or now
+        with self._lock:
+            self._db.execute(
+                "UPDATE http_cache SET expires_at = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified), last_used = ? WHERE key = ?",
+                (expires_at, headers.get("ETag"), headers.get("Last-Modified"), now, key)
+            )
+            self._db.commit()
+
+    # Called with the lock held: drops least recently used entries until under budget
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._db.execute("SELECT key, size FROM http_cache ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                return
+            self._db.execute("DELETE FROM http_cache WHERE key = ?", (row[0],))
+            total -= row[1]
+            self.counters["evicted"] += 1
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+        event(f"http_cache_{name}")
+
+    def get(self, session, url: str, params: Dict, timeout: float) -> bytes:
+        query = flatten_params(params)
+        key = cache_key(url, query)
+        entry = self.lookup(key)
+        if self.is_fresh(entry):
+            self.count("hits")
+            return entry.body
+
+        response = session.get(url, params=query, headers=self.conditional_headers(entry), timeout=timeout)
+        if response.status_code == 304 and entry is not None:
+            self.count("revalidated")
+            self.refresh(key, response.headers)
+            return entry.body
+
+        response.raise_for_status()
+        self.count("misses")
+        self.store(key, response.headers, response.content)
+        return response.content
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM http_cache").fetchone()
+        served = counters.get("hits", 0) + counters.get("revalidated", 0)
+        requests = served + counters.get("misses", 0)
+        return {
+            **counters,
+            "entries": entries,
+            "bytes": size,
+            "hit_ratio": served / requests if requests else 0.0
+        }
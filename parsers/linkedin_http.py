@@ -0,0 +1,88 @@
+import logging
+import requests
+from typing import List, Dict
+from lxml import html
+from requests.adapters import HTTPAdapter
+from config import LINKEDIN_GUEST_API_URL, LINKEDIN_HTTP_TIMEOUT, LINKEDIN_HTTP_POOL_SIZE, LINKEDIN_MAX_RESULTS
+from metrics import span, event
+
+logger = logging.getLogger(__name__)
+
+# What LinkedIn answers with when it wants a login or has flagged us (999 is its own bot status)
+BLOCKED_STATUSES = {401, 403, 429, 999}
+
+HEADERS = {
+"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+"Accept": "text/html,application/xhtml+xml",
+"Accept-Language": "en-US,en;q=0.9"
+}
+
+# Shared keep-alive session for the public job search pages
+session = requests.Session()
+session.headers.update(HEADERS)
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=LINKEDIN_HTTP_POOL_SIZE))
+
+# Result cards: the <li> items of a search page, or the bare <li> fragments the guest API returns
+CARD_XPATH = "descendant-or-self::li[.//*[@data-entity-urn] or .//a[contains(@class, 'base-card')]]"
+
+class LinkedInBlocked(Exception):
+    pass
+
+def first_text(card, xpath: str) -> str:
+    nodes = card.xpath(xpath)
+    return nodes[0].text_content().strip() if nodes else ""
+
+# Same fields as EXTRACT_CARDS_SCRIPT reads in the browser, so both paths share card_to_vacancy
+def parse_cards(markup: str) -> List[Dict]:
+    if not markup or not markup.strip():
+        return []
+
+    cards = []
+    for item in html.fromstring(markup).xpath(CARD_XPATH):
+        base = item.xpath(".//*[@data-entity-urn]")
+        links = item.xpath(".//a[contains(@class, 'base-card__full-link')]") or item.xpath(".//a[@href]")
+        posted = item.xpath(".//time")
+        cards.append({
+            "job_id": base[0].get("data-entity-urn").split(":")[-1] if base else "",
+            "title": first_text(item, ".//h3"),
+            "company": first_text(item, ".//h4"),
+            "url": links[0].get("href", "") if links else "",
+            "location": first_text(item, ".//*[contains(@class, 'job-search-card__location')]"),
+            "posted_at": (posted[0].get("datetime") or posted[0].text_content().strip()) if posted else ""
+        })
+    return cards
+
+def build_params(settings) -> Dict:
+    return {
+    "keywords": " ".join(settings.keywords),
+    "location": " ".join(settings.locations)
+    }
+
+def fetch_page(params: Dict, start: int) -> List[Dict]:
+    with span("linkedin_http_request"):
+        response = session.get(
+            LINKEDIN_GUEST_API_URL,
+            params={**params, "start": start},
+            timeout=LINKEDIN_HTTP_TIMEOUT,
+            allow_redirects=False
+        )
+    # A redirect here goes to the authwall or a checkpoint, never to results
+    if response.status_code in BLOCKED_STATUSES or response.is_redirect:
+        event("linkedin_http_blocked")
+        raise LinkedInBlocked(f"status {response.status_code}")
+    response.raise_for_status()
+    with span("linkedin_parse"):
+        return parse_cards(response.text)
+
+# Pages through results by offset until the limit or an empty page
+def search_cards(settings, limit: int = LINKEDIN_MAX_RESULTS) -> List[Dict]:
+    params = build_params(settings)
+    cards = []
+    while len(cards) < limit:
+        page = fetch_page(params, len(cards))
+        if not page:
+            break
+        cards.extend(page)
+
+    logger.debug(f"LinkedIn guest search returned {len(cards)} cards")
+    return cards[:limit]
@@ -1,172 +1,210 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-from config import LINKEDIN_PASSWORD, YOUR_EMAIL
+from selenium.common.exceptions import TimeoutException
+from config import LINKEDIN_PASSWORD, YOUR_EMAIL, LINKEDIN_POOL_TIMEOUT
+from config import LINKEDIN_MAX_RESULTS, LINKEDIN_MAX_SCROLLS, LINKEDIN_SEARCH_BUDGET
+from config import LINKEDIN_HTTP_ENABLED, LINKEDIN_HTTP_POOL_SIZE
+import asyncio
 import logging
-import time
-import traceback
-import random
-import pickle
-from typing import List, Dict
-from database import get_user_settings
-from config import SessionLocal
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional
+from cache import cached_search
+from parsers.driver_pool import driver_pool, cookie_jar
+from parsers import linkedin_http
+from parsers.linkedin_http import LinkedInBlocked
+from parsers.pacing import Pacer, network_idle
+from metrics import event, observe
 
 logger = logging.getLogger(__name__)
 
-def save_cookies(driver, path):
-    with open(path, 'wb') as filehandler:
-        pickle.dump(driver.get_cookies(), filehandler)
-
-def load_cookies(driver, path):
-    with open(path, 'rb') as cookiesfile:
-        cookies = pickle.load(cookiesfile)
-        for cookie in cookies:
-            driver.add_cookie(cookie)
-
-def human_like_delay(min=1, max=3):
-    time.sleep(random.uniform(min, max))
+# LinkedIn searches block; the asyncio runtime runs them here. Selenium fallbacks still queue on the driver pool
+search_executor = ThreadPoolExecutor(max_workers=LINKEDIN_HTTP_POOL_SIZE, thread_name_prefix="linkedin")
+
+LOGIN_URL = "https://www.linkedin.com/login"
+RESULT_CARDS = ".jobs-search__results-list > li"
+
+# Reads every card from index arguments[0] on in a single WebDriver round trip
+EXTRACT_CARDS_SCRIPT = """
+const text = (root, selector) => {
+    const element = root.querySelector(selector);
+    return element ? element.textContent.trim() : '';
+};
+const cards = Array.from(document.querySelectorAll('%s')).slice(arguments[0]);
+return cards.map(card => {
+    const link = card.querySelector('a.base-card__full-link') || card.querySelector('a');
+    const base = card.querySelector('[data-entity-urn]');
+    const posted = card.querySelector('time');
+    return {
+        job_id: base ? base.getAttribute('data-entity-urn').split(':').pop() : '',
+        title: text(card, 'h3'),
+        company: text(card, 'h4'),
+        url: link ? link.href : '',
+        location: text(card, '.job-search-card__location'),
+        posted_at: posted ? (posted.getAttribute('datetime') || posted.textContent.trim()) : ''
+    };
+});
+""" % RESULT_CARDS
+
+COUNT_CARDS_SCRIPT = "return document.querySelectorAll('%s').length;" % RESULT_CARDS
+
+def card_to_vacancy(card: Dict) -> Dict:
+    url = card.get("url") or ""
+    return {
+        "external_id": card.get("job_id") or None,
+        "title": card.get("title") or 'Not specified',
+        "company": card.get("company") or 'Not specified',
+        "salary": "Not specified",  # LinkedIn often doesn't show salary
+        "url": url.split("?")[0] if url else url,
+        "location": card.get("location") or None,
+        "posted_at": card.get("posted_at") or None,
+        "source": "LinkedIn"
+    }
+
+# Scrolls until enough cards are loaded, extracting only cards not seen before
+def collect_cards(driver, limit: int = LINKEDIN_MAX_RESULTS, max_scrolls: int = LINKEDIN_MAX_SCROLLS,
+                  pacer: Optional[Pacer] = None) -> List[Dict]:
+    cards = []
+    for scroll in range(max_scrolls + 1):
+        cards.extend(driver.execute_script(EXTRACT_CARDS_SCRIPT, len(cards)))
+        if len(cards) >= limit or scroll == max_scrolls:
+            break
+
+        loaded = len(cards)
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        more_cards = lambda d: d.execute_script(COUNT_CARDS_SCRIPT) > loaded
+        try:
+            if pacer:
+                pacer.wait(driver, more_cards, 3, "more results")
+            else:
+                WebDriverWait(driver, 3).until(more_cards)
+        except TimeoutException:
+            # Nothing new appeared (end of the list) or the search is out of time: keep what we have
+            break
+    return cards[:limit]
 
-def human_like_type(element, text):
+def human_like_type(element, text, pacer: Pacer):
     for char in text:
         element.send_keys(char)
-    time.sleep(random.uniform(0.1, 0.3))
-
-def parse_linkedin(user_id: int) -> List[Dict]:
-    db = SessionLocal()
-    try:
-        settings = get_user_settings(db, user_id)
-        if not settings:
-            return []
-
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("useAutomationExtension", False)
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--disable-blink-features=AutomationControlled")
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option("useAutomationExtension", False)
-        options.add_argument(
-            "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        options.add_argument("--disable-infobars")
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-popup-blocking")
-        options.add_argument("--ignore-certificate-errors")
-        options.add_argument("--disable-web-security")
-        options.add_argument("--disable-notifications")
-        options.add_argument("--disable-save-password-bubble")
-        options.add_argument("--disable-single-click-autofill")
-        options.add_argument("--disable-autofill-keyboard-accessory-view[8]")
-        options.add_argument("--disable-translate")
-
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
-            "source": """
-        Object.defineProperty(navigator, 'webdriver', {
-        get: () => undefined
-        });
-        Object.defineProperty(navigator, 'plugins', {
-        get: () => [1, 2, 3]
-        });
-        """
-        })
-
-        return login_and_search(driver, settings)
+    pacer.jitter(0.1, 0.3)
 
-    except Exception as e:
-        logger.error(f"LinkedIn parsing error: {e}")
-        logger.debug(traceback.format_exc())
+def parse_linkedin(settings) -> List[Dict]:
+    if not settings:
         return []
-    finally:
-        db.close()
-        try:
-            driver.quit()
-        except Exception as e:
-            logger.warning(f"Driver quit failed: {e}")
 
-def login_and_search(driver, settings):
-    try:
+    return cached_search("LinkedIn", search_linkedin, settings)
 
+async def parse_linkedin_async(settings) -> List[Dict]:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(search_executor, parse_linkedin, settings)
+
+def search_linkedin(query) -> List[Dict]:
+    if LINKEDIN_HTTP_ENABLED:
         try:
+            cards = linkedin_http.search_cards(query)
+            if cards:
+                return [card_to_vacancy(card) for card in cards]
+            logger.info("LinkedIn guest search returned nothing, falling back to the browser")
+            event("linkedin_browser_fallback", reason="empty")
+        except LinkedInBlocked as e:
+            logger.warning(f"LinkedIn guest search blocked ({e}), falling back to the browser")
+            event("linkedin_browser_fallback", reason="blocked")
+        except requests.RequestException as e:
+            logger.warning(f"LinkedIn guest search failed ({e}), falling back to the browser")
+            event("linkedin_browser_fallback", reason="error")
+
+    return search_linkedin_browser(query)
+
+def search_linkedin_browser(query) -> List[Dict]:
+    with driver_pool.checkout(timeout=LINKEDIN_POOL_TIMEOUT) as pooled:
+        return login_and_search(pooled, query)
+
+def ensure_logged_in(pooled, pacer: Pacer):
+    driver = pooled.driver
+
+    # Warm drivers keep their session; only re-login when the cookie jar has expired
+    if pooled.logged_in and cookie_jar.is_valid():
+        event("linkedin_session", result="warm")
+        return
+
+    pooled.logged_in = False
+    if cookie_jar.is_valid():
+        with pacer.phase("cookies"):
             driver.get("https://www.linkedin.com")
-            load_cookies(driver, "linkedin_cookies.pkl")
+            for cookie in cookie_jar.get():
+                driver.add_cookie(cookie)
             driver.refresh()
-            human_like_delay(2, 4)
-
-            if "feed" in driver.current_url:
-                logger.info("Logged in via cookies")
-            else:
-                raise Exception("Cookies not valid")
-        except:
-            logger.info("Logging in normally")
-            driver.get("https://www.linkedin.com/login")
-            human_like_delay(2, 5)
-
-            username = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.ID, "username"))
-            )
-            password = driver.find_element(By.ID, "password")
-
-            human_like_type(username, YOUR_EMAIL)
-            human_like_delay(1, 2)
-            human_like_type(password, LINKEDIN_PASSWORD)
-            human_like_delay(1, 2)
+            # A live session lands on the feed, a dead one on the login page or the authwall
+            try:
+                pacer.wait(driver, EC.any_of(
+                    EC.url_contains("feed"), EC.url_contains("login"), EC.url_contains("authwall")
+                ), 10, "cookie login")
+            except TimeoutException:
+                pass
+
+        if "feed" in driver.current_url:
+            logger.info("Logged in via cookies")
+            event("linkedin_session", result="cookie_hit")
+            pooled.logged_in = True
+            return
+        event("linkedin_session", result="cookie_miss")
+        cookie_jar.invalidate()
+
+    logger.info("Logging in normally")
+    event("linkedin_session", result="login")
+    with pacer.phase("login"):
+        driver.get(LOGIN_URL)
+        username = pacer.wait(driver, EC.presence_of_element_located((By.ID, "username")), 10, "login form")
+        password = driver.find_element(By.ID, "password")
+
+        # The login form is where LinkedIn watches for bots, so keep human pauses here
+        pacer.jitter(0.5, 1.5)
+        human_like_type(username, YOUR_EMAIL, pacer)
+        pacer.jitter(0.5, 1.5)
+        human_like_type(password, LINKEDIN_PASSWORD, pacer)
+        pacer.jitter(0.5, 1.5)
+
+        login_url = driver.current_url
+        submit = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
+        submit.click()
+        pacer.wait(driver, EC.url_changes(login_url), 15, "login redirect")
+        # Let the landing page finish setting session cookies before saving them
+        try:
+            pacer.wait(driver, network_idle(), 5, "post-login load")
+        except TimeoutException:
+            pass
 
-            submit = driver.find_element(By.CSS_SELECTOR, "button[type='submit']")
-            submit.click()
-            human_like_delay(3, 6)
+    cookie_jar.save(driver.get_cookies())
+    pooled.logged_in = True
 
-            save_cookies(driver, "linkedin_cookies.pkl")
+def login_and_search(pooled, settings):
+    driver = pooled.driver
+    pacer = Pacer(LINKEDIN_SEARCH_BUDGET)
+    try:
+        ensure_logged_in(pooled, pacer)
 
         search_url = (
             f"https://www.linkedin.com/jobs/search/?keywords={'%20'.join(settings.keywords)}"
             f"&location={'%20'.join(settings.locations)}"
         )
-        driver.get(search_url)
-        human_like_delay(3, 6)
+        with pacer.phase("search"):
+            driver.get(search_url)
+            pacer.wait(driver, EC.presence_of_element_located((By.CSS_SELECTOR, ".jobs-search__results-list")),
+                       10, "results list")
 
-        # Wait for results
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, ".jobs-search__results-list"))
-        )
+        with pacer.phase("collect"):
+            cards = collect_cards(driver, pacer=pacer)
 
-        # Scroll to load more results
-        for _ in range(3):
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
-
-            # Parse results
-            vacancies = []
-            jobs = driver.find_elements(By.CSS_SELECTOR, ".jobs-search__results-list li")
-
-            for job in jobs[:15]:  # Limit to 15 results
-                try:
-                    title = job.find_element(By.CSS_SELECTOR, "h3").text.strip()
-                    company = job.find_element(By.CSS_SELECTOR, "h4").text.strip()
-                    url = job.find_element(By.CSS_SELECTOR, "a").get_attribute("href")
-
-                    vacancies.append({
-                        "title": title if title else 'Not specified',
-                        "company": company if company else 'Not specified',
-                        "salary": "Not specified",  # LinkedIn often doesn't show salary
-                        "url": url,
-                        "source": "LinkedIn"
-                    })
-                except Exception as e:
-                    logger.warning(f"Error parsing LinkedIn job: {e}")
-
-            return vacancies
+        logger.info(f"LinkedIn browser search: {pacer.summary()}")
+        return [card_to_vacancy(card) for card in cards]
 
     except Exception as e:
-        logger.error(f"Error during LinkedIn search: {e}")
-        return []
+        logger.error(f"Error during LinkedIn search ({pacer.summary()}): {e}")
+        # Don't hand a driver in an unknown state to the next search
+        pooled.broken = True
+        raise
+    finally:
+        # cookies, login, search and collect (scroll + extract) as separate stages
+        for phase, seconds in pacer.timings.items():
+            observe(f"linkedin_{phase}", seconds)
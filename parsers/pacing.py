@@ -0,0 +1,63 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+# Page has finished loading and no new resources were requested since the previous poll
+class network_idle:
+    SCRIPT = "return [document.readyState, performance.getEntriesByType('resource').length];"
+
+    def __init__(self):
+        self.last_count = None
+
+    def __call__(self, driver) -> bool:
+        state, count = driver.execute_script(self.SCRIPT)
+        idle = state == "complete" and count == self.last_count
+        self.last_count = count
+        return idle
+
+# Paces one browser search: waits on page conditions instead of fixed sleeps,
+# keeps everything inside a total latency budget and times each phase
+class Pacer:
+    def __init__(self, budget: float, poll: float = 0.25):
+        self.budget = budget
+        self.poll = poll
+        self.started = time.monotonic()
+        self.deadline = self.started + budget
+        self.timings: Dict[str, float] = {}
+        self.current = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    @contextmanager
+    def phase(self, name: str):
+        previous, self.current = self.current, name
+        started = time.monotonic()
+        try:
+            yield self
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.monotonic() - started
+            self.current = previous
+
+    def wait(self, driver, condition: Callable, timeout: float, message: str = ""):
+        timeout = min(timeout, self.remaining())
+        if timeout <= 0:
+            raise TimeoutException(f"latency budget exhausted in {self.current or 'search'}: {message}")
+        return WebDriverWait(driver, timeout, poll_frequency=self.poll).until(condition, message)
+
+    # Human-like pause where the site watches timing (typing, clicking); skipped once the budget runs low
+    def jitter(self, low: float, high: float):
+        pause = random.uniform(low, high)
+        if pause < self.remaining() / 2:
+            time.sleep(pause)
+
+    def summary(self) -> str:
+        phases = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in self.timings.items())
+        total = time.monotonic() - self.started
+        return f"{phases} (total {total:.1f}s of {self.budget:.0f}s budget)"
@@ -0,0 +1,136 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import numpy as np
+from cache import SearchQuery
+from parsers.hh_areas import area_index
+from parsers.hh_currency import salary_rubles
+from parsers.hh_parser import resolve_area
+
+WORD = re.compile(r"\w+")
+
+# Experience ids get small integer codes; 0 means the subscriber takes any experience
+NO_EXPERIENCE = 0
+
+
+def tokenize(text: str) -> List[str]:
+    return WORD.findall(text.casefold())
+
+def vacancy_text(vacancy: Dict) -> str:
+    return " ".join(vacancy.get(field) or "" for field in ("title", "company", "description"))
+
+
+# Reverse search: subscriptions are compiled once, then each fetched vacancy is matched against all of them.
+# Same rules as the local index: every keyword as a phrase in title, company or description;
+# location text or HH area; salary and experience only filter vacancies that state them
+class Percolator:
+    def __init__(self, subscriptions: Dict[int, SearchQuery]):
+        self.user_ids = np.fromiter(subscriptions, dtype=np.int64, count=len(subscriptions))
+        size = len(self.user_ids)
+        self.salary_min = np.zeros(size, dtype=np.int64)
+        self.experience = np.zeros(size, dtype=np.int16)
+        self.keyword_count = np.zeros(size, dtype=np.int16)
+        self.experience_codes: Dict[str, int] = {}
+
+        # Subscriptions with one keyword match on it alone; the others count matched keywords
+        single = defaultdict(list)
+        multi = defaultdict(list)
+        by_location = defaultdict(list)
+        keyword_ids: Dict[tuple, int] = {}
+        self.phrases: Dict[str, List[Tuple[tuple, int]]] = defaultdict(list)
+
+        for row, query in enumerate(subscriptions.values()):
+            self.salary_min[row] = query.salary_min or 0
+            if query.experience:
+                code = self.experience_codes.setdefault(query.experience, len(self.experience_codes) + 1)
+                self.experience[row] = code
+
+            keywords = []
+            for keyword in query.keywords:
+                phrase = tuple(tokenize(keyword))
+                if not phrase:
+                    continue
+                if phrase not in keyword_ids:
+                    keyword_ids[phrase] = len(keyword_ids)
+                    self.phrases[phrase[0]].append((phrase, keyword_ids[phrase]))
+                keywords.append(keyword_ids[phrase])
+            keywords = set(keywords)
+            self.keyword_count[row] = len(keywords)
+            for keyword_id in keywords:
+                (single if len(keywords) == 1 else multi)[keyword_id].append(row)
+
+            for location in query.locations:
+                by_location[location].append(row)
+
+        self.single = {key: np.array(rows, dtype=np.int64) for key, rows in single.items()}
+        self.multi = {key: np.array(rows, dtype=np.int64) for key, rows in multi.items()}
+        self.no_keywords = np.flatnonzero(self.keyword_count == 0)
+
+        self.locations = list(by_location)
+        self.location_rows = [np.array(by_location[location], dtype=np.int64) for location in self.locations]
+        self.location_areas = [resolve_area(location) for location in self.locations]
+        self.no_locations = np.ones(size, dtype=bool)
+        for rows in self.location_rows:
+            self.no_locations[rows] = False
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def matched_keywords(self, vacancy: Dict) -> List[int]:
+        tokens = tokenize(vacancy_text(vacancy))
+        found = set()
+        for start, token in enumerate(tokens):
+            for phrase, keyword_id in self.phrases.get(token, ()):
+                if tuple(tokens[start:start + len(phrase)]) == phrase:
+                    found.add(keyword_id)
+        return list(found)
+
+    # Rows whose every keyword occurs in the vacancy
+    def keyword_candidates(self, vacancy: Dict) -> np.ndarray:
+        found = self.matched_keywords(vacancy)
+        parts = [self.no_keywords]
+        parts += [self.single[keyword_id] for keyword_id in found if keyword_id in self.single]
+        counted = [self.multi[keyword_id] for keyword_id in found if keyword_id in self.multi]
+        if counted:
+            rows, hits = np.unique(np.concatenate(counted), return_counts=True)
+            parts.append(rows[hits == self.keyword_count[rows]])
+        return np.concatenate(parts)
+
+    def location_mask(self, vacancy: Dict) -> np.ndarray:
+        text = (vacancy.get("location") or "").casefold()
+        area_id = vacancy.get("area_id")
+        # An HH vacancy in Kazan is also in Tatarstan and in Russia
+        areas = area_index().ancestors(area_id) if vacancy.get("source") == "HeadHunter" and area_id else set()
+        mask = self.no_locations.copy()
+        for location, area, rows in zip(self.locations, self.location_areas, self.location_rows):
+            if location in text or area in areas:
+                mask[rows] = True
+        return mask
+
+    # Subscriber ids for each vacancy, in input order
+    def match(self, vacancies: List[Dict]) -> List[np.ndarray]:
+        location_masks = {}
+        results = []
+        for vacancy in vacancies:
+            rows = self.keyword_candidates(vacancy)
+            if not len(rows):
+                results.append(self.user_ids[rows])
+                continue
+
+            # In rubles, as /search compares it
+            top = salary_rubles(vacancy)
+            if top is not None:
+                rows = rows[self.salary_min[rows] <= top]
+
+            if vacancy.get("experience"):
+                code = self.experience_codes.get(vacancy["experience"], -1)
+                experience = self.experience[rows]
+                rows = rows[(experience == NO_EXPERIENCE) | (experience == code)]
+
+            # A batch has few distinct places, so their masks are computed once
+            place = (vacancy.get("source"), vacancy.get("location"), vacancy.get("area_id"))
+            mask = location_masks.get(place)
+            if mask is None:
+                mask = location_masks[place] = self.location_mask(vacancy)
+            results.append(self.user_ids[rows[mask[rows]]])
+        return results
@@ -0,0 +1,210 @@
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from cache import SearchQuery, meets_salary, normalize_query
+from config import SessionLocal, SCHEDULER_TICK, SCHEDULER_WORKERS, SCHEDULER_JITTER
+from config import SCHEDULER_SOURCE_BUDGETS, SCHEDULER_MAX_HELD, PERCOLATOR_ENABLED
+from dedup import deduplicate
+from database import get_active_subscriptions, upsert_vacancies, select_new_vacancies
+from percolator import Percolator
+from ratelimit import TokenBucket
+from search import SOURCES, SEARCH_DONE, run_sources
+from sources import JobSource
+from vacancy_index import mark_refreshed
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionScheduler:
+    def __init__(self, notify: Callable[[int, List[Dict]], None]):
+        self.notify = notify
+        # Budgets allow a burst of one minute's worth of polls per source
+        self._budgets = {
+            name: TokenBucket(rate / 60, max(rate, 1))
+            for name, rate in SCHEDULER_SOURCE_BUDGETS.items()
+        }
+        self._next_poll: Dict[tuple, float] = {}
+        self._in_flight = set()
+        self._subscriptions: Dict[int, SearchQuery] = {}
+        self._salary_min: Dict[int, int] = {}
+        self._percolator = None
+        # {user_id: {vacancy_id: vacancy}} found for a subscriber and not yet delivered
+        self._held: Dict[int, Dict[int, Dict]] = defaultdict(dict)
+        # When each subscriber may be notified next; a group is polled as often as its most eager member
+        self._due: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=SCHEDULER_WORKERS, thread_name_prefix="scheduler")
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="subscription-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {e}", exc_info=True)
+            self._stop.wait(SCHEDULER_TICK)
+
+    # Groups subscribers by effective query: {query: {user_id: interval_minutes}}.
+    # The query's salary is a bucket, so each subscriber's own minimum is kept aside
+    def load_groups(self) -> Dict[SearchQuery, Dict[int, int]]:
+        db = SessionLocal()
+        try:
+            groups = defaultdict(dict)
+            salaries = {}
+            for settings, subscription in get_active_subscriptions(db):
+                groups[normalize_query(settings)][settings.user_id] = subscription.interval_minutes
+                salaries[settings.user_id] = settings.salary_min or 0
+            self._salary_min = salaries
+            return groups
+        finally:
+            db.close()
+
+    # Recompiled only when some subscriber's effective query changed
+    def update_percolator(self, groups: Dict[SearchQuery, Dict[int, int]]):
+        subscriptions = {
+            user_id: query._replace(salary_min=self._salary_min.get(user_id, query.salary_min))
+            for query, subscribers in groups.items() for user_id in subscribers
+        }
+        if subscriptions == self._subscriptions:
+            return
+        started = time.perf_counter()
+        self._percolator = Percolator(subscriptions)
+        self._subscriptions = subscriptions
+        logger.info(f"Percolator compiled {len(subscriptions)} subscriptions in {time.perf_counter() - started:.2f}s")
+
+    def _hold(self, user_id: int, vacancy_id: int, vacancy: Dict):
+        held = self._held[user_id]
+        held[vacancy_id] = vacancy
+        if len(held) > SCHEDULER_MAX_HELD:
+            del held[next(iter(held))]
+
+    # Vacancies other groups found for a subscriber wait until the subscriber's own query is polled,
+    # so nobody is notified more often than their interval allows
+    def hold_matches(self, vacancies: List[Dict], vacancy_ids: List[int], user_ids: List[int]):
+        percolator = self._percolator
+        if percolator is None:
+            return
+        polled = set(user_ids)
+        with self._lock:
+            for vacancy, vacancy_id, matched in zip(vacancies, vacancy_ids, percolator.match(vacancies)):
+                for user_id in matched.tolist():
+                    if user_id not in polled:
+                        self._hold(user_id, vacancy_id, vacancy)
+
+    def release_matches(self, user_id: int) -> Dict[int, Dict]:
+        with self._lock:
+            return self._held.pop(user_id, {})
+
+    def tick(self):
+        groups = self.load_groups()
+        now = time.time()
+        if PERCOLATOR_ENABLED:
+            self.update_percolator(groups)
+
+        with self._lock:
+            subscribed = {user_id for subscribers in groups.values() for user_id in subscribers}
+            for user_id in [user_id for user_id in self._held if user_id not in subscribed]:
+                del self._held[user_id]
+            for user_id in [user_id for user_id in self._due if user_id not in subscribed]:
+                del self._due[user_id]
+            for key in list(self._next_poll):
+                if key[1] not in groups:
+                    del self._next_poll[key]
+
+        for query, subscribers in groups.items():
+            interval = min(subscribers.values()) * 60
+            sources = {}
+
+            with self._lock:
+                if query in self._in_flight:
+                    continue
+
+                for name, source in SOURCES.items():
+                    if self._next_poll.get((name, query), 0) > now or not source.available():
+                        continue
+                    budget = self._budgets.get(name)
+                    if budget is not None and not budget.try_acquire():
+                        # Out of budget for this source: try again next tick
+                        continue
+                    sources[name] = source
+                    jitter = random.uniform(1 - SCHEDULER_JITTER, 1 + SCHEDULER_JITTER)
+                    self._next_poll[(name, query)] = now + interval * jitter
+
+                if not sources:
+                    continue
+                self._in_flight.add(query)
+
+            self._executor.submit(self.poll, query, dict(subscribers), sources)
+
+    # subscribers: {user_id: interval_minutes}
+    def poll(self, query: SearchQuery, subscribers: Dict[int, int], sources: Dict[str, JobSource]):
+        try:
+            vacancies = []
+            refreshed = []
+            for name, outcome, found in run_sources(query, sources):
+                vacancies.extend(found)
+                if outcome == SEARCH_DONE:
+                    refreshed.append(name)
+
+            vacancies = deduplicate(vacancies)
+            db = SessionLocal()
+            try:
+                # One upsert for the whole group, then an indexed delivery check per subscriber
+                vacancy_ids = upsert_vacancies(db, vacancies) if vacancies else []
+                # Stored and indexed: /search for this query can answer locally now
+                for name in refreshed:
+                    mark_refreshed(name, query)
+                self.hold_matches(vacancies, vacancy_ids, list(subscribers))
+
+                now = time.time()
+                for user_id, interval in subscribers.items():
+                    salary_min = self._salary_min.get(user_id)
+                    own = [
+                        (vacancy_id, vacancy) for vacancy_id, vacancy in zip(vacancy_ids, vacancies)
+                        if meets_salary(vacancy, salary_min)
+                    ]
+                    with self._lock:
+                        due = self._due.get(user_id, 0) <= now
+                        if not due:
+                            # Polled for a group member with a shorter interval: keep until this one is due
+                            for vacancy_id, vacancy in own:
+                                self._hold(user_id, vacancy_id, vacancy)
+                    if not due:
+                        continue
+
+                    # This poll's results plus everything held since the subscriber's last notification
+                    batch = dict(own)
+                    for vacancy_id, vacancy in self.release_matches(user_id).items():
+                        batch.setdefault(vacancy_id, vacancy)
+                    if not batch:
+                        continue
+                    fresh = select_new_vacancies(db, user_id, list(batch.values()), list(batch))
+                    if not fresh:
+                        continue
+                    with self._lock:
+                        # Less the jitter, so a poll that comes a little early doesn't skip a whole interval
+                        self._due[user_id] = now + interval * 60 * (1 - SCHEDULER_JITTER)
+                    try:
+                        self.notify(user_id, fresh)
+                    except Exception as e:
+                        logger.error(f"Error notifying subscriber {user_id}: {e}")
+            finally:
+                db.close()
+        except Exception as e:
+            logger.error(f"Scheduled poll failed for {query}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(query)
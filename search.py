@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+import aiohttp
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from config import SEARCH_WORKERS, SOURCE_TIMEOUTS, DEFAULT_SOURCE_TIMEOUT
+from config import SOURCE_CONCURRENCY, DEFAULT_SOURCE_CONCURRENCY, SOURCE_RETRIES, SOURCE_RETRY_BACKOFF
+from config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+from parsers.hh_parser import parse_hh, parse_hh_async
+from parsers.linkedin_parser import parse_linkedin, parse_linkedin_async
+from sources import SOURCES, JobSource, SourceUnavailable, register_source
+from metrics import Gauge, label_key, register
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: the next attempt may well succeed
+TRANSIENT_ERRORS = (requests.RequestException, aiohttp.ClientError, asyncio.TimeoutError, ConnectionError)
+
+def source_options(name: str) -> Dict:
+    return {
+    "timeout": SOURCE_TIMEOUTS.get(name, DEFAULT_SOURCE_TIMEOUT),
+    "concurrency": SOURCE_CONCURRENCY.get(name, DEFAULT_SOURCE_CONCURRENCY),
+    "retries": SOURCE_RETRIES.get(name, 0),
+    "backoff": SOURCE_RETRY_BACKOFF,
+    "retry_on": TRANSIENT_ERRORS,
+    "failure_threshold": BREAKER_FAILURE_THRESHOLD,
+    "reset_timeout": BREAKER_RESET_TIMEOUT
+    }
+
+# A new board is a parser module plus one line here; handlers and the scheduler iterate SOURCES
+register_source(JobSource("HeadHunter", parse_hh, parse_hh_async, **source_options("HeadHunter")))
+register_source(JobSource("LinkedIn", parse_linkedin, parse_linkedin_async, **source_options("LinkedIn")))
+
+register(Gauge(
+    "jobbot_source_circuit_open",
+    "1 while a source is skipped after repeated failures",
+    lambda: {label_key({"source": name}): int(not source.available()) for name, source in SOURCES.items()}
+))
+
+# Shared pool so a slow source never blocks the others
+executor = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+SEARCH_DONE = "done"
+SEARCH_TIMEOUT = "timeout"
+SEARCH_ERROR = "error"
+SEARCH_UNAVAILABLE = "unavailable"
+
+
+# Runs all sources in parallel and yields (source, outcome, vacancies) as each one finishes
+def run_sources(
+    settings,
+    sources: Optional[Dict[str, JobSource]] = None
+) -> Iterator[Tuple[str, str, List[Dict]]]:
+    sources = SOURCES if sources is None else sources
+    started = time.monotonic()
+    skipped = [name for name, source in sources.items() if not source.available()]
+    pending = {
+        executor.submit(source.fetch, settings): name
+        for name, source in sources.items() if name not in skipped
+    }
+    deadlines = {name: started + source.timeout for name, source in sources.items()}
+
+    # A source with an open circuit is skipped right away instead of waiting out its timeout
+    for name in skipped:
+        logger.info(f"{name} skipped: circuit open")
+        yield name, SEARCH_UNAVAILABLE, []
+
+    while pending:
+        now = time.monotonic()
+        for future, name in list(pending.items()):
+            if deadlines[name] <= now:
+                del pending[future]
+                future.cancel()
+                logger.warning(f"{name} search timed out after {now - started:.1f}s")
+                yield name, SEARCH_TIMEOUT, []
+
+        if not pending:
+            break
+
+        timeout = min(deadlines[name] for name in pending.values()) - now
+        done, _ = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            name = pending.pop(future)
+            try:
+                vacancies = future.result()
+            except SourceUnavailable as e:
+                logger.info(f"{name} skipped: {e}")
+                yield name, SEARCH_UNAVAILABLE, []
+                continue
+            except Exception as e:
+                logger.error(f"{name} search error: {e}")
+                yield name, SEARCH_ERROR, []
+                continue
+
+            logger.info(f"{name} returned {len(vacancies)} jobs in {time.monotonic() - started:.1f}s")
+            yield name, SEARCH_DONE, vacancies
+
+
+# asyncio counterpart of run_sources: waiting on slow sources doesn't hold a thread
+async def run_sources_async(
+    settings,
+    sources: Optional[Dict[str, JobSource]] = None
+) -> AsyncIterator[Tuple[str, str, List[Dict]]]:
+    sources = SOURCES if sources is None else sources
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    skipped = [name for name, source in sources.items() if not source.available()]
+    pending = {
+        asyncio.ensure_future(source.fetch_async(settings)): name
+        for name, source in sources.items() if name not in skipped
+    }
+    deadlines = {name: started + source.timeout for name, source in sources.items()}
+
+    try:
+        for name in skipped:
+            logger.info(f"{name} skipped: circuit open")
+            yield name, SEARCH_UNAVAILABLE, []
+
+        while pending:
+            now = loop.time()
+            for task, name in list(pending.items()):
+                if deadlines[name] <= now:
+                    del pending[task]
+                    task.cancel()
+                    logger.warning(f"{name} search timed out after {now - started:.1f}s")
+                    yield name, SEARCH_TIMEOUT, []
+
+            if not pending:
+                break
+
+            timeout = min(deadlines[name] for name in pending.values()) - now
+            done, _ = await asyncio.wait(pending, timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                name = pending.pop(task)
+                try:
+                    vacancies = task.result()
+                except SourceUnavailable as e:
+                    logger.info(f"{name} skipped: {e}")
+                    yield name, SEARCH_UNAVAILABLE, []
+                    continue
+                except Exception as e:
+                    logger.error(f"{name} search error: {e}")
+                    yield name, SEARCH_ERROR, []
+                    continue
+
+                logger.info(f"{name} returned {len(vacancies)} jobs in {loop.time() - started:.1f}s")
+                yield name, SEARCH_DONE, vacancies
+    finally:
+        for task in pending:
+            task.cancel()
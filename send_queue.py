@@ -0,0 +1,189 @@
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Dict
+from telebot.apihelper import ApiTelegramException
+from config import SEND_WORKERS, TELEGRAM_GLOBAL_RATE, TELEGRAM_CHAT_RATE, TELEGRAM_CHAT_BURST, SEND_MAX_RETRIES
+from metrics import span, observe, event
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Idle per-chat buckets beyond this count are dropped, oldest first
+MAX_CHAT_BUCKETS = 10000
+# Shortest wait before a throttled chat is tried again
+MIN_DELAY = 0.001
+
+
+def retry_after(error: ApiTelegramException) -> float:
+    parameters = (error.result_json or {}).get("parameters") or {}
+    return parameters.get("retry_after", 1)
+
+
+class Job:
+    def __init__(self, chat_id: int, fn: Callable, args: tuple, kwargs: dict, future: Future):
+        self.chat_id = chat_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+        self.started = False
+
+
+class SendQueue:
+    def __init__(
+        self,
+        workers: int = SEND_WORKERS,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        chat_burst: float = TELEGRAM_CHAT_BURST
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.counters = Counter()
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = OrderedDict()
+        self._lock = threading.Lock()
+        # Each chat always lands on the same worker, which keeps its messages in order
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._depths = [0] * workers
+        self._threads = [
+            threading.Thread(target=self._work, args=(i,), name=f"send-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # Several processes sending with one bot token split Telegram's global limit between them
+    def set_global_rate(self, rate: float):
+        self._global = TokenBucket(rate, rate)
+
+    def submit(self, chat_id: int, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        worker = hash(chat_id) % len(self._queues)
+        with self._lock:
+            self._depths[worker] += 1
+        self._queues[worker].put(Job(chat_id, fn, args, kwargs, future))
+        self._count("submitted")
+        return future
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+        event(f"telegram_{name}")
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        with self._lock:
+            bucket = self._chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+                while len(self._chat_buckets) > MAX_CHAT_BUCKETS:
+                    self._chat_buckets.popitem(last=False)
+            else:
+                self._chat_buckets.move_to_end(chat_id)
+            return bucket
+
+    # A throttled chat goes back on the heap with the time it may send again, so the
+    # worker moves on to other chats instead of sleeping
+    def _work(self, worker: int):
+        jobs = self._queues[worker]
+        pending: Dict[int, deque] = {}
+        ready = []
+        order = itertools.count()
+
+        while True:
+            timeout = max(0, ready[0][0] - time.monotonic()) if ready else None
+            incoming = []
+            try:
+                if timeout != 0:
+                    incoming.append(jobs.get(timeout=timeout))
+                for _ in range(jobs.qsize()):
+                    incoming.append(jobs.get_nowait())
+            except queue.Empty:
+                pass
+            for job in incoming:
+                if job.chat_id not in pending:
+                    pending[job.chat_id] = deque()
+                    heapq.heappush(ready, (time.monotonic(), next(order), job.chat_id))
+                pending[job.chat_id].append(job)
+
+            if not ready or ready[0][0] > time.monotonic():
+                continue
+            _, _, chat_id = heapq.heappop(ready)
+            chat_jobs = pending[chat_id]
+            delay = self._attempt(chat_jobs[0])
+            if delay:
+                heapq.heappush(ready, (time.monotonic() + delay, next(order), chat_id))
+                continue
+
+            chat_jobs.popleft()
+            with self._lock:
+                self._depths[worker] -= 1
+            if chat_jobs:
+                heapq.heappush(ready, (time.monotonic(), next(order), chat_id))
+            else:
+                del pending[chat_id]
+
+    # Sends the job if both limits allow; returns how long its chat must wait, or 0 once the job is finished
+    def _attempt(self, job: Job) -> float:
+        if not job.started:
+            job.started = True
+            if not job.future.set_running_or_notify_cancel():
+                return 0
+
+        bucket = self._chat_bucket(job.chat_id)
+        delay = bucket.delay()
+        if delay:
+            return delay
+        if not self._global.try_acquire():
+            return max(self._global.delay(), MIN_DELAY)
+        # Only this worker takes tokens from this chat's bucket, so the token checked above is still there
+        bucket.try_acquire()
+
+        if job.attempts == 0:
+            # Time spent behind other messages and rate limits
+            observe("telegram_queue_wait", time.monotonic() - job.queued_at)
+        try:
+            with span("telegram_send"):
+                result = job.fn(*job.args, **job.kwargs)
+        except ApiTelegramException as e:
+            if e.error_code == 429 and job.attempts < SEND_MAX_RETRIES:
+                job.attempts += 1
+                self._count("retried")
+                delay = retry_after(e)
+                logger.warning(f"Telegram flood limit for chat {job.chat_id}, retrying in {delay}s")
+                return max(delay, MIN_DELAY)
+            self._fail(job.chat_id, job.future, e)
+        except Exception as e:
+            self._fail(job.chat_id, job.future, e)
+        else:
+            self._count("sent")
+            job.future.set_result(result)
+        return 0
+
+    def _fail(self, chat_id: int, future: Future, error: Exception):
+        self._count("failed")
+        logger.error(f"Error sending to chat {chat_id}: {error}")
+        future.set_exception(error)
+
+    # Messages submitted and not yet sent or failed, including those waiting on a rate limit
+    def depth(self) -> int:
+        with self._lock:
+            return sum(self._depths)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self.counters)
+            depths = list(self._depths)
+        return {
+            "depth": sum(depths),
+            "worker_depths": depths,
+            **counters
+        }
@@ -0,0 +1,85 @@
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from typing import Optional
+from config import SessionLocal, DEFAULT_SEARCH_PARAMS, SETTINGS_CACHE_SIZE
+from database import get_user_settings, update_user_settings
+
+logger = logging.getLogger(__name__)
+
+# Immutable snapshot of a UserSettings row, safe to share between threads
+SearchSettings = namedtuple("SearchSettings", ["user_id", "keywords", "locations", "salary_min", "experience"])
+
+# Cached marker for users without a settings row
+MISSING = object()
+
+
+def snapshot(row) -> SearchSettings:
+    return SearchSettings(
+        user_id=row.user_id,
+        keywords=list(row.keywords),
+        locations=list(row.locations),
+        salary_min=row.salary_min,
+        experience=row.experience
+    )
+
+
+class SettingsRepository:
+    def __init__(self, session_factory=SessionLocal, max_entries: int = SETTINGS_CACHE_SIZE):
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, user_id: int, value):
+        with self._lock:
+            self._cache[user_id] = value
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def get(self, user_id: int) -> Optional[SearchSettings]:
+        with self._lock:
+            value = self._cache.get(user_id)
+            if value is not None:
+                self._cache.move_to_end(user_id)
+                return None if value is MISSING else value
+
+        db = self.session_factory()
+        try:
+            row = get_user_settings(db, user_id)
+            value = snapshot(row) if row else MISSING
+        finally:
+            db.close()
+
+        self._remember(user_id, value)
+        return None if value is MISSING else value
+
+    def get_or_default(self, user_id: int) -> SearchSettings:
+        return self.get(user_id) or SearchSettings(user_id=user_id, **DEFAULT_SEARCH_PARAMS)
+
+    # Writes the changed fields (on top of current or default settings) and updates the cache
+    def update(self, user_id: int, **changes) -> SearchSettings:
+        values = self.get_or_default(user_id)._replace(**changes)._asdict()
+        values.pop("user_id")
+
+        db = self.session_factory()
+        try:
+            row = update_user_settings(db, user_id, values)
+            value = snapshot(row)
+        except Exception:
+            # The row may or may not have been written; make the next read go to the database
+            self.invalidate(user_id)
+            raise
+        finally:
+            db.close()
+
+        self._remember(user_id, value)
+        return value
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+
+settings_repository = SettingsRepository()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Type
+from metrics import span, event
+
+logger = logging.getLogger(__name__)
+
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half-open"
+
+
+class SourceUnavailable(Exception):
+    pass
+
+
+# Stops calling a source after repeated failures; after reset_timeout one trial call decides whether it is back
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = BREAKER_CLOSED
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == BREAKER_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return BREAKER_HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == BREAKER_CLOSED:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_running:
+                return False
+            self._state = BREAKER_HALF_OPEN
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = BREAKER_CLOSED
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == BREAKER_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != BREAKER_OPEN:
+                    logger.warning(f"{self.name} circuit opened after {self._failures} failures")
+                    event("circuit_opened", source=self.name)
+                self._state = BREAKER_OPEN
+                self._opened_at = time.monotonic()
+
+
+# A job board: how to search it and how hard to try.
+# search takes a settings object or normalized query and raises on failure instead of returning []
+class JobSource:
+    def __init__(
+        self,
+        name: str,
+        search: Callable[..., List[Dict]],
+        search_async: Optional[Callable[..., Awaitable[List[Dict]]]] = None,
+        timeout: float = 30,
+        concurrency: int = 4,
+        retries: int = 0,
+        backoff: float = 0.5,
+        retry_on: Tuple[Type[BaseException], ...] = (),
+        failure_threshold: int = 5,
+        reset_timeout: float = 60
+    ):
+        self.name = name
+        self.search = search
+        self.search_async = search_async
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_on = retry_on
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self._semaphore = threading.BoundedSemaphore(concurrency)
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+
+    def available(self) -> bool:
+        return self.breaker.state != BREAKER_OPEN
+
+    # Exponential backoff with jitter, or None when there is no retry left or no time for it
+    def retry_delay(self, attempt: int, error: BaseException, started: float) -> Optional[float]:
+        if attempt >= self.retries or not isinstance(error, self.retry_on):
+            return None
+        delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+        if time.monotonic() - started + delay >= self.timeout:
+            return None
+        return delay
+
+    # Success that arrives after the caller's deadline still counts as a failure: nobody got the result
+    def record_result(self, started: float):
+        if time.monotonic() - started > self.timeout:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def fetch(self, settings) -> List[Dict]:
+        if not self.available():
+            raise SourceUnavailable(f"{self.name} circuit is open")
+
+        started = time.monotonic()
+        if not self._semaphore.acquire(timeout=self.timeout):
+            raise SourceUnavailable(f"{self.name} is at its concurrency limit")
+        try:
+            if not self.breaker.allow():
+                raise SourceUnavailable(f"{self.name} circuit is open")
+
+            attempt = 0
+            while True:
+                try:
+                    with span("source", source=self.name):
+                        vacancies = self.search(settings)
+                except Exception as e:
+                    delay = self.retry_delay(attempt, e, started)
+                    if delay is None:
+                        self.breaker.record_failure()
+                        raise
+                    logger.warning(f"{self.name} search failed ({e}), retrying in {delay:.1f}s")
+                    event("source_retry", source=self.name)
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+                self.record_result(started)
+                return vacancies
+        finally:
+            self._semaphore.release()
+
+    async def fetch_async(self, settings) -> List[Dict]:
+        if self.search_async is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.fetch, settings)
+
+        if not self.available():
+            raise SourceUnavailable(f"{self.name} circuit is open")
+
+        # Created on first use so it belongs to the running loop
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.concurrency)
+
+        started = time.monotonic()
+        async with self._async_semaphore:
+            if not self.breaker.allow():
+                raise SourceUnavailable(f"{self.name} circuit is open")
+
+            attempt = 0
+            try:
+                while True:
+                    try:
+                        with span("source", source=self.name):
+                            vacancies = await self.search_async(settings)
+                    except Exception as e:
+                        delay = self.retry_delay(attempt, e, started)
+                        if delay is None:
+                            self.breaker.record_failure()
+                            raise
+                        logger.warning(f"{self.name} search failed ({e}), retrying in {delay:.1f}s")
+                        event("source_retry", source=self.name)
+                        await asyncio.sleep(delay)
+                        attempt += 1
+                        continue
+                    self.record_result(started)
+                    return vacancies
+            except asyncio.CancelledError:
+                # Cancelled at the search deadline
+                self.breaker.record_failure()
+                raise
+
+
+# Job sources keyed by display name, in registration order
+SOURCES: Dict[str, JobSource] = {}
+
+def register_source(source: JobSource) -> JobSource:
+    SOURCES[source.name] = source
+    return source
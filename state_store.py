@@ -0,0 +1,116 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from config import SessionLocal, STATE_CACHE_SIZE
+from models import ConversationState
+
+logger = logging.getLogger(__name__)
+
+# Users without a stored state are in this state
+DEFAULT_STATE = 0
+
+
+class StateBackend:
+    def get(self, user_id: int) -> Optional[int]:
+        raise NotImplementedError
+
+    def set(self, user_id: int, state: int):
+        raise NotImplementedError
+
+    def delete(self, user_id: int):
+        raise NotImplementedError
+
+
+class MemoryStateBackend(StateBackend):
+    def __init__(self):
+        self._states: Dict[int, int] = {}
+
+    def get(self, user_id: int) -> Optional[int]:
+        return self._states.get(user_id)
+
+    def set(self, user_id: int, state: int):
+        self._states[user_id] = state
+
+    def delete(self, user_id: int):
+        self._states.pop(user_id, None)
+
+
+class DatabaseStateBackend(StateBackend):
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def get(self, user_id: int) -> Optional[int]:
+        db = self.session_factory()
+        try:
+            row = db.get(ConversationState, user_id)
+            return row.state if row else None
+        finally:
+            db.close()
+
+    def set(self, user_id: int, state: int):
+        db = self.session_factory()
+        try:
+            db.merge(ConversationState(user_id=user_id, state=state))
+            db.commit()
+        finally:
+            db.close()
+
+    def delete(self, user_id: int):
+        db = self.session_factory()
+        try:
+            db.query(ConversationState).filter(ConversationState.user_id == user_id).delete()
+            db.commit()
+        finally:
+            db.close()
+
+
+# Dict-like conversation state with an in-memory front cache over a shared backend.
+# Only the process that owns a user (see webhook.py) writes their state, so the cache stays coherent.
+class StateStore:
+    def __init__(self, backend: StateBackend, max_entries: int = STATE_CACHE_SIZE):
+        self.backend = backend
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, user_id: int, state: int):
+        with self._lock:
+            self._cache[user_id] = state
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def get(self, user_id: int) -> int:
+        with self._lock:
+            state = self._cache.get(user_id)
+            if state is not None:
+                self._cache.move_to_end(user_id)
+                return state
+
+        try:
+            state = self.backend.get(user_id)
+        except Exception as e:
+            logger.error(f"Error loading conversation state: {e}")
+            return DEFAULT_STATE
+        state = DEFAULT_STATE if state is None else state
+        self._remember(user_id, state)
+        return state
+
+    def __getitem__(self, user_id: int) -> int:
+        return self.get(user_id)
+
+    def __setitem__(self, user_id: int, state: int):
+        try:
+            if state == DEFAULT_STATE:
+                self.backend.delete(user_id)
+            else:
+                self.backend.set(user_id, state)
+        except Exception as e:
+            # Keep the conversation going in this process even if the write is lost
+            logger.error(f"Error saving conversation state: {e}")
+        self._remember(user_id, state)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._cache)
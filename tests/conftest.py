@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Tests never touch the network or the developer's databases and caches
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+import config
+
+config.RESULT_CACHE_PATH = None
+config.HH_HTTP_CACHE_PATH = ":memory:"
+config.HH_AREAS_CACHE_PATH = os.path.join(tempfile.mkdtemp(), "hh_areas.json")
+config.HH_AREAS_TTL = float("inf")
+config.HH_CURRENCY_TTL = float("inf")
+config.METRICS_ENABLED = False
+
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures")
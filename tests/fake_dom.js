@@ -0,0 +1,92 @@
+// Just enough of the DOM to run the browser-side LinkedIn scripts under node: elements, textContent,
+// getAttribute, href, document.body, and querySelector(All) with tag, .class and [attr] selectors joined by ' ' or '>'.
+// Reads {tree, script, args} as JSON on stdin and prints the script's return value as JSON.
+const fs = require('fs');
+
+class Element {
+    constructor(node, parent) {
+        this.tagName = node.tag;
+        this.attrs = node.attrs;
+        this.parentNode = parent;
+        this.childNodes = node.children.map(child => typeof child === 'string' ? child : new Element(child, this));
+        this.children = this.childNodes.filter(child => typeof child !== 'string');
+    }
+
+    get textContent() {
+        return this.childNodes.map(child => typeof child === 'string' ? child : child.textContent).join('');
+    }
+
+    get href() {
+        return this.getAttribute('href') || '';
+    }
+
+    getAttribute(name) {
+        return name in this.attrs ? this.attrs[name] : null;
+    }
+
+    descendants() {
+        return this.children.flatMap(child => [child, ...child.descendants()]);
+    }
+
+    querySelectorAll(selector) {
+        const parts = parseSelector(selector);
+        return this.descendants().filter(element => matches(element, parts, parts.length - 1));
+    }
+
+    querySelector(selector) {
+        return this.querySelectorAll(selector)[0] || null;
+    }
+}
+
+function parseSelector(selector) {
+    const parts = [];
+    let combinator = ' ';
+    for (const token of selector.replace(/>/g, ' > ').trim().split(/\s+/)) {
+        if (token === '>') {
+            combinator = '>';
+            continue;
+        }
+        parts.push({
+            combinator,
+            tag: (token.match(/^[a-z0-9]+/i) || [''])[0].toLowerCase(),
+            classes: [...token.matchAll(/\.([\w-]+)/g)].map(match => match[1]),
+            attrs: [...token.matchAll(/\[([\w-]+)\]/g)].map(match => match[1])
+        });
+        combinator = ' ';
+    }
+    return parts;
+}
+
+function matchesCompound(element, part) {
+    if (part.tag && element.tagName !== part.tag) {
+        return false;
+    }
+    const classes = (element.getAttribute('class') || '').split(/\s+/);
+    return part.classes.every(name => classes.includes(name)) && part.attrs.every(name => element.getAttribute(name) !== null);
+}
+
+// Right to left, as browsers do
+function matches(element, parts, index) {
+    if (!matchesCompound(element, parts[index])) {
+        return false;
+    }
+    if (index === 0) {
+        return true;
+    }
+    for (let parent = element.parentNode; parent; parent = parent.parentNode) {
+        if (matches(parent, parts, index - 1)) {
+            return true;
+        }
+        if (parts[index].combinator === '>') {
+            return false;
+        }
+    }
+    return false;
+}
+
+const input = JSON.parse(fs.readFileSync(0, 'utf8'));
+const document = new Element({tag: '#document', attrs: {}, children: [input.tree]}, null);
+document.body = document.querySelector('body');
+const window = {scrollTo() {}};
+const run = new Function('document', 'window', 'args', `return (function () {\n${input.script}\n}).apply(null, args);`);
+process.stdout.write(JSON.stringify(run(document, window, input.args) ?? null));
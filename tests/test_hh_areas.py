@@ -0,0 +1,67 @@
+import pytest
+from config import HH_AREAS_SNAPSHOT_PATH
+from parsers.hh_areas import AreaIndex, area_key, read_tree
+
+MOSCOW, SAINT_PETERSBURG, KAZAN, TATARSTAN, RUSSIA = 1, 2, 88, 1624, 113
+
+
+@pytest.fixture(scope="module")
+def index():
+    return AreaIndex(read_tree(HH_AREAS_SNAPSHOT_PATH))
+
+
+@pytest.mark.parametrize("location, area_id", [
+    ("Kazan", KAZAN),
+    ("Казань", KAZAN),
+    ("  kazan' ", KAZAN),
+    ("Moscow", MOSCOW),
+    ("Москва", MOSCOW),
+    ("MSK", MOSCOW),
+    ("SPb", SAINT_PETERSBURG),
+    ("St. Petersburg", SAINT_PETERSBURG),
+    ("Санкт-Петербург", SAINT_PETERSBURG),
+    ("Питер", SAINT_PETERSBURG),
+    ("Yekaterinburg", 3),
+    ("Ekaterinburg", 3),
+    ("Республика Татарстан", TATARSTAN),
+    ("Tatarstan", TATARSTAN),
+    ("remote", RUSSIA),
+])
+def test_resolve_spellings_and_aliases(index, location, area_id):
+    assert index.resolve(location) == area_id
+
+
+@pytest.mark.parametrize("location", ["Atlantis", "", "   ", "Kazan Kazan"])
+def test_resolve_unknown_is_none(index, location):
+    assert index.resolve(location) is None
+
+
+def test_cyrillic_and_latin_share_a_key():
+    assert area_key("Казань") == area_key("Kazan")
+    assert area_key("Щёлково") == area_key("Shchelkovo")
+
+
+@pytest.mark.parametrize("prefix", ["Каз", "kaz", "KAZ"])
+def test_suggest_by_prefix(index, prefix):
+    suggestions = index.suggest(prefix)
+    assert suggestions[0] == "Казань"
+    assert "Казахстан" in suggestions
+
+
+def test_suggest_orders_shorter_names_first(index):
+    assert index.suggest("mos")[:2] == ["Москва", "Московская область"]
+
+
+def test_suggest_respects_limit(index):
+    assert len(index.suggest("s", limit=3)) <= 3
+
+
+@pytest.mark.parametrize("prefix", ["zzz", "", "!"])
+def test_suggest_nothing(index, prefix):
+    assert index.suggest(prefix) == []
+
+
+def test_ancestors_and_descendants(index):
+    assert index.ancestors(KAZAN) == {KAZAN, TATARSTAN, RUSSIA}
+    assert KAZAN in index.descendants([RUSSIA])
+    assert MOSCOW not in index.descendants([TATARSTAN])
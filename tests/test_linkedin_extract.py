@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import subprocess
+import pytest
+from lxml import html
+from conftest import FIXTURES
+from parsers import linkedin_http
+from parsers.linkedin_parser import EXTRACT_CARDS_SCRIPT, card_to_vacancy, collect_cards
+
+NODE = shutil.which("node")
+FAKE_DOM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_dom.js")
+RESULTS_LIST = "jobs-search__results-list"
+
+pytestmark = pytest.mark.skipif(NODE is None, reason="needs node to run the extraction script")
+
+
+def read_fixture() -> str:
+    with open(os.path.join(FIXTURES, "linkedin_search.html"), encoding="utf-8") as f:
+        return f.read()
+
+def to_json(element, visible: int) -> dict:
+    children = [element.text] if element.text else []
+    kept = list(element)
+    if RESULTS_LIST in (element.get("class") or "").split():
+        kept = kept[:visible]
+    for child in kept:
+        if isinstance(child.tag, str):
+            children.append(to_json(child, visible))
+        if child.tail:
+            children.append(child.tail)
+    return {"tag": element.tag.lower(), "attrs": dict(element.attrib), "children": children}
+
+
+# Stands in for a WebDriver on the saved results page: execute_script runs the script in node,
+# and each scroll shows `step` more cards, as LinkedIn's infinite list does
+class NodeDriver:
+    def __init__(self, visible: int = 1000, step: int = 0):
+        self.root = html.fromstring(read_fixture())
+        self.visible = visible
+        self.step = step
+        self.scrolls = 0
+
+    def execute_script(self, script: str, *args):
+        if script.startswith("window.scrollTo"):
+            self.scrolls += 1
+            self.visible += self.step
+        payload = json.dumps({"tree": to_json(self.root, self.visible), "script": script, "args": list(args)})
+        result = subprocess.run([NODE, FAKE_DOM], input=payload, capture_output=True, text=True, check=True)
+        return json.loads(result.stdout)
+
+
+def test_extracts_every_card():
+    cards = NodeDriver().execute_script(EXTRACT_CARDS_SCRIPT, 0)
+    assert len(cards) == 25
+    assert cards[0] == {
+        "job_id": "3790339563",
+        "title": "Backend Engineer (Python/Django)",
+        "company": "Ozon",
+        "url": cards[0]["url"],
+        "location": "Moscow, Moscow City, Russia",
+        "posted_at": "2024-05-03"
+    }
+    assert cards[0]["url"].startswith("https://www.linkedin.com/jobs/view/backend-engineer-python-django-at-ozon-3790339563?")
+    assert all(card["job_id"] and card["title"] and card["company"] and card["url"] for card in cards)
+    assert len({card["job_id"] for card in cards}) == 25
+
+def test_matches_the_http_parser():
+    # Both paths feed card_to_vacancy, so they must read the same fields the same way
+    assert NodeDriver().execute_script(EXTRACT_CARDS_SCRIPT, 0) == linkedin_http.parse_cards(read_fixture())
+
+def test_starts_at_the_given_index():
+    driver = NodeDriver()
+    assert driver.execute_script(EXTRACT_CARDS_SCRIPT, 20) == driver.execute_script(EXTRACT_CARDS_SCRIPT, 0)[20:]
+
+def test_collect_cards_scrolls_for_more():
+    everything = NodeDriver().execute_script(EXTRACT_CARDS_SCRIPT, 0)
+    driver = NodeDriver(visible=10, step=10)
+    cards = collect_cards(driver, limit=25, max_scrolls=5)
+    assert cards == everything
+    assert driver.scrolls == 2
+
+def test_collect_cards_stops_at_the_limit():
+    driver = NodeDriver(visible=10, step=10)
+    cards = collect_cards(driver, limit=5)
+    assert [card["job_id"] for card in cards] == [card["job_id"] for card in NodeDriver().execute_script(EXTRACT_CARDS_SCRIPT, 0)[:5]]
+    assert driver.scrolls == 0
+
+def test_card_to_vacancy_drops_tracking_parameters():
+    vacancy = card_to_vacancy(NodeDriver().execute_script(EXTRACT_CARDS_SCRIPT, 0)[0])
+    assert vacancy["url"] == "https://www.linkedin.com/jobs/view/backend-engineer-python-django-at-ozon-3790339563"
+    assert vacancy["external_id"] == "3790339563"
+    assert vacancy["source"] == "LinkedIn"
@@ -0,0 +1,146 @@
+import os
+import pytest
+import requests
+from lxml import html
+from conftest import FIXTURES
+from parsers import linkedin_http, linkedin_parser
+from parsers.linkedin_http import LinkedInBlocked, parse_cards, search_cards
+
+AUTHWALL = "https://www.linkedin.com/authwall?trk=public_jobs&sessionRedirect=https%3A%2F%2Fwww.linkedin.com%2Fjobs"
+
+
+class Settings:
+    keywords = ["python", "backend"]
+    locations = ["Moscow"]
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+def response(status: int = 200, text: str = "", location: str = None) -> requests.Response:
+    result = requests.Response()
+    result.status_code = status
+    result._content = text.encode("utf-8")
+    result.encoding = "utf-8"
+    if location:
+        result.headers["Location"] = location
+    return result
+
+# The guest API answers each offset with bare <li> fragments, like the cards on the saved search page
+def guest_pages(page_size: int = 10):
+    items = html.fromstring(read_fixture("linkedin_search.html")).xpath("//ul[contains(@class, 'jobs-search__results-list')]/li")
+    fragments = [html.tostring(item, encoding="unicode") for item in items]
+    return lambda start: response(text="".join(fragments[start:start + page_size]))
+
+
+@pytest.fixture
+def requests_made(monkeypatch):
+    made = []
+
+    def serve(answer):
+        def get(url, params=None, **kwargs):
+            made.append(params)
+            assert kwargs["allow_redirects"] is False
+            return answer(params["start"])
+        monkeypatch.setattr(linkedin_http.session, "get", get)
+        return made
+    return serve
+
+@pytest.fixture
+def browser(monkeypatch):
+    searches = []
+
+    def search_linkedin_browser(query):
+        searches.append(query)
+        return [{"title": "From the browser"}]
+    monkeypatch.setattr(linkedin_parser, "search_linkedin_browser", search_linkedin_browser)
+    monkeypatch.setattr(linkedin_parser, "LINKEDIN_HTTP_ENABLED", True)
+    return searches
+
+
+def test_parses_the_search_page():
+    cards = parse_cards(read_fixture("linkedin_search.html"))
+    assert len(cards) == 25
+    assert cards[0]["job_id"] == "3790339563"
+    assert cards[0]["title"] == "Backend Engineer (Python/Django)"
+    assert cards[0]["company"] == "Ozon"
+    assert cards[0]["location"] == "Moscow, Moscow City, Russia"
+    assert cards[0]["posted_at"] == "2024-05-03"
+    assert cards[0]["url"].startswith("https://www.linkedin.com/jobs/view/backend-engineer-python-django-at-ozon-3790339563?")
+    assert len({card["job_id"] for card in cards}) == 25
+
+def test_parses_guest_api_fragments():
+    cards = parse_cards(read_fixture("linkedin_guest_page.html"))
+    assert len(cards) == 10
+    assert cards == parse_cards(read_fixture("linkedin_search.html"))[:10]
+
+def test_empty_page_has_no_cards():
+    assert parse_cards("") == []
+    assert parse_cards("   \n") == []
+    assert parse_cards("<html><body><p>No matching jobs</p></body></html>") == []
+
+def test_pages_by_offset_until_the_limit(requests_made):
+    made = requests_made(guest_pages())
+    cards = search_cards(Settings(), limit=20)
+    assert [params["start"] for params in made] == [0, 10]
+    assert cards == parse_cards(read_fixture("linkedin_search.html"))[:20]
+    assert made[0]["keywords"] == "python backend"
+    assert made[0]["location"] == "Moscow"
+
+def test_offset_follows_short_pages(requests_made):
+    made = requests_made(guest_pages(page_size=7))
+    cards = search_cards(Settings(), limit=10)
+    assert [params["start"] for params in made] == [0, 7]
+    assert len(cards) == 10
+
+def test_stops_at_an_empty_page(requests_made):
+    made = requests_made(guest_pages())
+    cards = search_cards(Settings(), limit=50)
+    assert [params["start"] for params in made] == [0, 10, 20, 25]
+    assert len(cards) == 25
+
+@pytest.mark.parametrize("status", [999, 429])
+def test_blocked_status_raises(requests_made, status):
+    requests_made(lambda start: response(status))
+    with pytest.raises(LinkedInBlocked):
+        search_cards(Settings())
+
+def test_authwall_redirect_raises(requests_made):
+    requests_made(lambda start: response(302, location=AUTHWALL))
+    with pytest.raises(LinkedInBlocked):
+        search_cards(Settings())
+
+def test_blocked_on_a_later_page_raises(requests_made):
+    pages = guest_pages()
+    made = requests_made(lambda start: pages(start) if start == 0 else response(999))
+    with pytest.raises(LinkedInBlocked):
+        search_cards(Settings(), limit=20)
+    assert [params["start"] for params in made] == [0, 10]
+
+def test_uses_guest_results(requests_made, browser):
+    requests_made(guest_pages())
+    vacancies = linkedin_parser.search_linkedin(Settings())
+    assert len(vacancies) == 25
+    assert vacancies[0]["url"] == "https://www.linkedin.com/jobs/view/backend-engineer-python-django-at-ozon-3790339563"
+    assert browser == []
+
+@pytest.mark.parametrize("answer", [
+    lambda start: response(999),
+    lambda start: response(429),
+    lambda start: response(302, location=AUTHWALL),
+    lambda start: response(303, location="https://www.linkedin.com/checkpoint/challenge"),
+    lambda start: response(text="<html><body></body></html>")
+], ids=["999", "429", "authwall", "checkpoint", "empty"])
+def test_falls_back_to_the_browser(requests_made, browser, answer):
+    requests_made(answer)
+    settings = Settings()
+    assert linkedin_parser.search_linkedin(settings) == [{"title": "From the browser"}]
+    assert browser == [settings]
+
+def test_falls_back_on_connection_errors(monkeypatch, browser):
+    def get(url, **kwargs):
+        raise requests.ConnectionError("connection reset")
+    monkeypatch.setattr(linkedin_http.session, "get", get)
+    assert linkedin_parser.search_linkedin(Settings()) == [{"title": "From the browser"}]
+    assert len(browser) == 1
@@ -0,0 +1,112 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+from sqlalchemy import and_, column, or_, select, table, text
+from sqlalchemy.orm import Session
+from cache import SearchQuery, normalize_query
+from config import SessionLocal, LOCAL_INDEX_TTLS, LOCAL_INDEX_LIMIT, LOCAL_INDEX_MAX_AGE_DAYS
+from database import upsert_statement
+from metrics import span
+from models import Vacancy, VacancyDocument, IndexedQuery
+from parsers.hh_areas import area_index
+from parsers.hh_parser import get_area_ids
+
+logger = logging.getLogger(__name__)
+
+vacancy_fts = table("vacancy_fts", column("rowid"), column("rank"))
+
+
+def query_key(query: SearchQuery) -> str:
+    return json.dumps(list(query))
+
+# Every keyword must match as a phrase, like HH's "A AND B" text query
+def fts_query(keywords: Iterable[str]) -> str:
+    return " AND ".join('"' + keyword.replace('"', '""') + '"' for keyword in keywords)
+
+def location_filter(locations: Iterable[str]):
+    locations = list(locations)
+    conditions = [VacancyDocument.area.contains(location, autoescape=True) for location in locations]
+    # HH results match by area, including the cities inside a requested region or country
+    area_ids = get_area_ids(locations)
+    if area_ids:
+        covered = area_index().descendants(area_ids)
+        conditions.append(and_(Vacancy.source == "HeadHunter", VacancyDocument.area_id.in_(covered)))
+    return or_(*conditions)
+
+# Vacancies that have no salary or experience on the board are kept, as the boards do
+def search_index(db: Session, query: SearchQuery, limit: int = LOCAL_INDEX_LIMIT) -> List[Dict]:
+    since = datetime.utcnow() - timedelta(days=LOCAL_INDEX_MAX_AGE_DAYS)
+    rows = (
+        db.query(Vacancy, VacancyDocument)
+        .join(VacancyDocument, VacancyDocument.vacancy_id == Vacancy.id)
+        .filter(Vacancy.last_seen_at >= since)
+    )
+    order = []
+
+    if query.keywords:
+        if db.bind.dialect.name == "sqlite":
+            matches = select(vacancy_fts.c.rowid, vacancy_fts.c.rank).where(text("vacancy_fts MATCH :match")).subquery()
+            rows = rows.join(matches, matches.c.rowid == Vacancy.id).params(match=fts_query(query.keywords))
+            order.append(matches.c.rank)
+        else:
+            for keyword in query.keywords:
+                rows = rows.filter(or_(
+                    Vacancy.title.ilike(f"%{keyword}%"),
+                    Vacancy.company.ilike(f"%{keyword}%"),
+                    VacancyDocument.description.ilike(f"%{keyword}%")
+                ))
+
+    if query.locations:
+        rows = rows.filter(location_filter(query.locations))
+    if query.salary_min:
+        rows = rows.filter(or_(VacancyDocument.salary_rub.is_(None), VacancyDocument.salary_rub >= query.salary_min))
+    if query.experience:
+        rows = rows.filter(or_(VacancyDocument.experience.is_(None), VacancyDocument.experience == query.experience))
+
+    order += [VacancyDocument.posted_at.desc(), Vacancy.last_seen_at.desc()]
+    return [
+        {**vacancy.to_dict(), "vacancy_id": vacancy.id, "location": document.area}
+        for vacancy, document in rows.order_by(*order).limit(limit)
+    ]
+
+def search_local(settings, limit: int = LOCAL_INDEX_LIMIT) -> List[Dict]:
+    # The user's own minimum, not its bucket
+    query = normalize_query(settings)._replace(salary_min=settings.salary_min or 0)
+    db = SessionLocal()
+    try:
+        with span("local_index"):
+            return search_index(db, query, limit)
+    finally:
+        db.close()
+
+# Sources whose results for these settings are older than their TTL, or were never fetched
+def stale_sources(settings, names: Iterable[str]) -> List[str]:
+    key = query_key(normalize_query(settings))
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        refreshed = dict(
+            db.query(IndexedQuery.source, IndexedQuery.refreshed_at).filter(IndexedQuery.query_key == key)
+        )
+    finally:
+        db.close()
+    return [
+        name for name in names
+        if name not in refreshed or refreshed[name] < now - timedelta(seconds=LOCAL_INDEX_TTLS.get(name, 0))
+    ]
+
+def mark_refreshed(source: str, settings):
+    row = {"source": source, "query_key": query_key(normalize_query(settings)), "refreshed_at": datetime.utcnow()}
+    db = SessionLocal()
+    try:
+        stmt = upsert_statement(db, IndexedQuery.__table__).values(row)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[IndexedQuery.source, IndexedQuery.query_key],
+            set_={"refreshed_at": stmt.excluded.refreshed_at}
+        ))
+        db.commit()
+    except Exception as e:
+        logger.error(f"Error marking {source} refreshed: {e}")
+    finally:
+        db.close()
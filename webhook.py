@@ -0,0 +1,181 @@
+import json
+import logging
+import multiprocessing
+import queue
+import threading
+from typing import Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot import apihelper
+from config import TELEGRAM_TOKEN, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_SECRET
+from config import WEBHOOK_WORKERS, WEBHOOK_THREADS_PER_WORKER, METRICS_ENABLED, METRICS_PORT, TELEGRAM_GLOBAL_RATE
+
+logger = logging.getLogger(__name__)
+
+UPDATE_KINDS = (
+    "message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+    "shipping_query", "pre_checkout_query", "poll_answer", "my_chat_member", "chat_member",
+    "chat_join_request",
+)
+
+# Never sent by Telegram; tells a worker process to exit
+STOP = None
+
+# Worker queues carry (lane, kind, payload): a raw update, or a subscriber notification from the scheduler
+UPDATE = "update"
+NOTIFY = "notify"
+
+
+def update_user_id(update: dict) -> int:
+    for kind in UPDATE_KINDS:
+        payload = update.get(kind)
+        if payload:
+            sender = payload.get("from") or payload.get("user") or payload.get("chat") or {}
+            return sender.get("id", 0)
+    return 0
+
+# Every user maps to one lane (a thread inside one worker process), so their updates are handled in order
+def lane_for(user_id: int, workers: int, threads: int):
+    slot = user_id % (workers * threads)
+    return slot % workers, slot // workers
+
+
+# peers holds every worker's queue and is given only to the worker that runs the scheduler
+def run_worker(index: int, updates, workers: int, threads: int, peers: Optional[list] = None):
+    # Configure logging before bot.py does, so each worker writes its own file
+    from metrics import setup_logging, start_metrics_server
+    setup_logging(f'log.worker{index}.log')
+    from telebot.types import Update
+    import bot as app
+
+    # Metrics are per process: worker N serves them on METRICS_PORT + N
+    if METRICS_ENABLED:
+        start_metrics_server(port=METRICS_PORT + index)
+
+    # The workers share one bot token, so each gets an equal part of Telegram's global rate limit
+    app.send_queue.set_global_rate(TELEGRAM_GLOBAL_RATE / workers)
+
+    # Lanes already give one thread per user; handlers must not be re-dispatched to telebot's pool
+    app.bot.threaded = False
+    if peers is not None:
+        # Digests are kept in the memory of the worker that sends them, and page turns go to the
+        # subscriber's own lane, so the scheduler hands each notification to that lane
+        def route_notification(user_id: int, vacancies: list):
+            worker, lane = lane_for(user_id, workers, threads)
+            peers[worker].put((lane, NOTIFY, (user_id, vacancies)))
+
+        app.scheduler.notify = route_notification
+        app.scheduler.start()
+
+    def drain(lane: queue.Queue):
+        while True:
+            kind, payload = lane.get()
+            try:
+                if kind == NOTIFY:
+                    app.notify_subscriber(*payload)
+                else:
+                    app.bot.process_new_updates([Update.de_json(payload)])
+            except Exception as e:
+                logger.error(f"Error processing {kind}: {e}", exc_info=True)
+
+    lanes = [queue.Queue() for _ in range(threads)]
+    for number, lane in enumerate(lanes):
+        threading.Thread(target=drain, args=(lane,), name=f"lane-{index}-{number}", daemon=True).start()
+
+    while True:
+        item = updates.get()
+        if item is STOP:
+            return
+        lane, kind, payload = item
+        lanes[lane].put((kind, payload))
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != WEBHOOK_PATH:
+            self.send_error(404)
+            return
+        if WEBHOOK_SECRET and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            self.send_error(403)
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length).decode("utf-8")
+            update = json.loads(raw)
+        except (ValueError, UnicodeDecodeError):
+            self.send_error(400)
+            return
+
+        self.server.dispatch(update_user_id(update), raw)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers: int = WEBHOOK_WORKERS, threads: int = WEBHOOK_THREADS_PER_WORKER):
+        super().__init__(address, WebhookHandler)
+        self.workers = workers
+        self.threads = threads
+        # spawn, not fork: the bot module starts threads that must not be copied into children
+        context = multiprocessing.get_context("spawn")
+        self.queues = [context.Queue() for _ in range(workers)]
+        self.processes = [
+            context.Process(
+                target=run_worker,
+                args=(index, self.queues[index], workers, threads, self.queues if index == 0 else None),
+                name=f"bot-worker-{index}",
+                daemon=True
+            )
+            for index in range(workers)
+        ]
+
+    def start_workers(self):
+        for process in self.processes:
+            process.start()
+
+    def dispatch(self, user_id: int, raw: str):
+        worker, lane = lane_for(user_id, self.workers, self.threads)
+        self.queues[worker].put((lane, UPDATE, raw))
+
+    def server_close(self):
+        super().server_close()
+        for updates in self.queues:
+            updates.put(STOP)
+        for process in self.processes:
+            process.join(timeout=5)
+
+
+def main():
+    from models import Base
+    from config import engine
+    from metrics import setup_logging
+
+    setup_logging('log.log')
+
+    # Create database tables once, before any worker touches them
+    Base.metadata.create_all(bind=engine)
+
+    server = WebhookServer((WEBHOOK_HOST, WEBHOOK_PORT))
+    server.start_workers()
+    apihelper.set_webhook(
+        TELEGRAM_TOKEN,
+        url=WEBHOOK_URL + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET or None,
+        drop_pending_updates=False
+    )
+
+    logger.info(f"Webhook listening on {WEBHOOK_HOST}:{WEBHOOK_PORT} with {WEBHOOK_WORKERS} workers")
+    print("Starting webhook server...")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()